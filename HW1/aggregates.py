@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from analysis import SEASONS
+
+NBINS = 30
+SEASON_COLORS = dict(zip(SEASONS, ['#80b1d3', '#ffffb3', '#ccebc5', '#fb8072']))
+PERCENTILES = [25, 50, 75]
+
+
+def histogram_bins(temperature: np.ndarray,
+                   nbins: int = NBINS):
+    '''
+    Бины гистограммы с нормировкой на вероятность (как histnorm="probability").
+    '''
+    counts, edges = np.histogram(temperature, bins=nbins)
+    return {"edges": edges, "probability": counts / max(len(temperature), 1)}
+
+
+def box_stats(temperature: np.ndarray):
+    '''
+    Квартили и усы по правилу Тьюки (1.5 IQR, но не дальше крайних значений), выбросы - отдельно.
+    '''
+    q1, median, q3 = np.percentile(temperature, PERCENTILES)
+    iqr = q3 - q1
+    inside = temperature[(temperature >= q1 - 1.5 * iqr) & (temperature <= q3 + 1.5 * iqr)]
+    lower, upper = inside.min(), inside.max()
+    return {
+        "q1": q1,
+        "median": median,
+        "q3": q3,
+        "mean": temperature.mean(),
+        "lowerfence": lower,
+        "upperfence": upper,
+        "outliers": temperature[(temperature < lower) | (temperature > upper)]
+    }
+
+
+def describe_stats(city_data: pd.DataFrame):
+    '''
+    Аналог city_data.describe() и describe(include='object') за один проход по numpy-массивам.
+    '''
+    temperature = city_data["temperature"].to_numpy(dtype=np.float64)
+    timestamps = city_data["timestamp"].to_numpy(dtype="datetime64[ns]")
+    index = ["count", "mean", "min", "25%", "50%", "75%", "max", "std"]
+
+    ### для дат считаем на int64 наносекунд
+    ts_values = timestamps.view(np.int64)
+    ts_percentiles = np.percentile(ts_values, PERCENTILES)
+    numeric = pd.DataFrame({
+        "timestamp": [len(timestamps), pd.Timestamp(int(ts_values.mean())), pd.Timestamp(ts_values.min()),
+                      *[pd.Timestamp(int(value)) for value in ts_percentiles], pd.Timestamp(ts_values.max()), pd.NaT],
+        "temperature": [len(temperature), temperature.mean(), temperature.min(),
+                        *np.percentile(temperature, PERCENTILES), temperature.max(), temperature.std(ddof=1)],
+    }, index=index)
+
+    categorical = {}
+    for column in ["city", "season"]:
+        counts = city_data[column].value_counts(sort=True)
+        counts = counts[counts > 0]
+        categorical[column] = [int(counts.sum()), len(counts), counts.index[0], int(counts.iloc[0])]
+    ### в колонках смешаны числа и строки/даты - приводим к строкам, чтобы таблица сериализовалась в Arrow без fallback
+    categorical = pd.DataFrame(categorical, index=["count", "unique", "top", "freq"]).astype(str)
+    numeric["timestamp"] = numeric["timestamp"].astype(str)
+    return numeric, categorical
+
+
+def aggregate_city(city_data: pd.DataFrame,
+                   nbins: int = NBINS):
+    '''
+    Все агрегаты для вкладок статистики и графиков по выбранному городу и периоду.
+    '''
+    temperature = city_data["temperature"].to_numpy(dtype=np.float64)
+    season = city_data["season"].to_numpy()
+    numeric, categorical = describe_stats(city_data)
+    return {
+        "histogram": histogram_bins(temperature, nbins),
+        "boxes": {name: box_stats(temperature[season == name]) for name in SEASONS if (season == name).any()},
+        "describe": numeric,
+        "describe_object": categorical
+    }
+
+
+def histogram_figure(histogram: dict):
+    edges = histogram["edges"]
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2,
+                           y=histogram["probability"],
+                           width=np.diff(edges),
+                           marker_color='#80b1d3'))
+    fig.update_layout(title="Temperature Distribution",
+                      xaxis_title="Temperature (°C)",
+                      yaxis_title="probability",
+                      bargap=0)
+    return fig
+
+
+def box_figure(boxes: dict):
+    fig = go.Figure()
+    for name, stats in boxes.items():
+        ### коробка из готовых квартилей - в браузер уходят 6 чисел на сезон вместо всех строк
+        fig.add_trace(go.Box(x=[name], name=name,
+                             q1=[stats["q1"]], median=[stats["median"]], q3=[stats["q3"]], mean=[stats["mean"]],
+                             lowerfence=[stats["lowerfence"]], upperfence=[stats["upperfence"]],
+                             marker_color=SEASON_COLORS[name]))
+        if len(stats["outliers"]):
+            fig.add_trace(go.Scatter(x=[name] * len(stats["outliers"]), y=stats["outliers"],
+                                     mode="markers", marker=dict(color=SEASON_COLORS[name]),
+                                     showlegend=False, name=name))
+    fig.update_layout(title="Seasonal Temperature Distribution",
+                      xaxis_title="Season",
+                      yaxis_title="Temperature (°C)")
+    return fig
@@ -0,0 +1,124 @@
+import pandas as pd
+from robust import robust_anomalies
+from trend import DAYS_PER_DECADE, batch_trends, trend_slope
+
+two_sigmas = 2  ### интервал для аномалий
+window = 30  ### окно скользящего среднего
+
+month_to_season = {12: "winter", 1: "winter", 2: "winter",
+                   3: "spring", 4: "spring", 5: "spring",
+                   6: "summer", 7: "summer", 8: "summer",
+                   9: "autumn", 10: "autumn", 11: "autumn"}
+SEASONS = ["winter", "spring", "summer", "autumn"]
+DETECTORS = ("mean_std", "median_mad")
+
+
+def analyze_city(city_df: pd.DataFrame,  ### должны подавать только отсортированные по дате данные (для rolling)
+                 window: int = 30,
+                 sigmas: float = two_sigmas):
+    city_df = city_df.sort_values(by="timestamp")
+    ### скользящее среднее и стандартное отклонение по всему городу
+    city_df["rolling_mean"] = city_df["temperature"].rolling(window=window).mean()
+    city_df["rolling_std"] = city_df["temperature"].rolling(window=window).std()
+
+    ### аномалии по скользящему среднему
+    city_df["is_anomaly"] = city_df.apply(lambda row:
+                                          row['temperature'] > row["rolling_mean"] + sigmas * row["rolling_std"]
+                                          or
+                                          row['temperature'] < row["rolling_mean"] - sigmas * row["rolling_std"],
+                                          axis=1)
+
+    ### avg, min, max температуры по городу за все время
+    avg_temp = city_df["temperature"].mean()
+    min_temp = city_df["temperature"].min()
+    max_temp = city_df["temperature"].max()
+
+    ### статистика по сезонам
+    city_season_df = city_df.groupby("season", observed=True)["temperature"].agg(season_avg_temp="mean",
+                                                                                  season_std_temp="std").reset_index()
+
+    ### тренд (МНК в закрытой форме)
+    days = (city_df["timestamp"] - city_df["timestamp"].min()).dt.days
+    slope = trend_slope(days, city_df["temperature"])
+    trend = "positive" if slope > 0 else "negative"
+
+    return {
+        "avg_temp": avg_temp,
+        "min_temp": min_temp,
+        "max_temp": max_temp,
+        "seasonal_profile": city_season_df,
+        "trend": trend,
+        "trend_per_decade": slope * DAYS_PER_DECADE,
+        "anomalies": city_df[city_df.is_anomaly == True]
+    }
+
+
+def analyze_all_cities(df: pd.DataFrame,
+                       window: int = 30,
+                       sigmas: float = two_sigmas,
+                       detector: str = "mean_std"):
+    '''
+    Анализируем все города за один сгруппированный векторизованный проход.
+    detector: "mean_std" - скользящее среднее ± σ (как в analyze_city), "median_mad" - скользящая медиана ± MAD.
+    Возвращаем словарь {город: результат в формате analyze_city}.
+    '''
+    if detector not in DETECTORS:
+        raise ValueError(f"Unknown detector: {detector}. Expected one of {DETECTORS}.")
+
+    df = df.sort_values(by=["city", "timestamp"], kind="stable")
+    grouped = df.groupby("city", sort=False, observed=True)["temperature"]
+
+    if detector == "median_mad":
+        ### устойчивый к выбросам вариант: сами аномалии не раздувают порог
+        df = robust_anomalies(df, window, sigmas)
+    else:
+        ### скользящие статистики по всем городам сразу (окно не пересекает границу городов)
+        rolling = grouped.rolling(window=window)
+        rolling_mean = rolling.mean().reset_index(level=0, drop=True)
+        rolling_std = rolling.std().reset_index(level=0, drop=True)
+
+        df = df.assign(rolling_mean=rolling_mean, rolling_std=rolling_std)
+        temperature = df["temperature"]
+        df["is_anomaly"] = ((temperature > df["rolling_mean"] + sigmas * df["rolling_std"])
+                            | (temperature < df["rolling_mean"] - sigmas * df["rolling_std"]))
+
+    ### avg, min, max по каждому городу
+    city_stats = grouped.agg(["mean", "min", "max"])
+
+    ### сезонные профили по всем городам
+    season_stats = df.groupby(["city", "season"], observed=True)["temperature"].agg(season_avg_temp="mean",
+                                                                                    season_std_temp="std")
+
+    ### тренды всех городов одной батчевой операцией
+    trends = batch_trends(df, by=("city",))
+
+    anomalies = df[df["is_anomaly"]]
+    anomalies_by_city = dict(tuple(anomalies.groupby("city", sort=False, observed=True)))
+
+    results = {}
+    for city in city_stats.index:
+        results[city] = {
+            "avg_temp": city_stats.at[city, "mean"],
+            "min_temp": city_stats.at[city, "min"],
+            "max_temp": city_stats.at[city, "max"],
+            "seasonal_profile": season_stats.loc[city].reset_index(),
+            "trend": trends.at[city, "trend"],
+            "trend_per_decade": trends.at[city, "slope_per_decade"],
+            "anomalies": anomalies_by_city.get(city, anomalies.iloc[0:0])
+        }
+    return results
+
+
+def anomality_check(current_temp: float,
+                    seasonal_profile: pd.DataFrame,
+                    season: str,
+                    sigmas: float = two_sigmas):
+    '''
+    Определяем, является ли текущая температура аномальной.
+    '''
+    season_df = seasonal_profile[seasonal_profile["season"] == season]
+    mean_temp = season_df["season_avg_temp"].values[0]
+    std_temp = season_df["season_std_temp"].values[0]
+
+    return current_temp < mean_temp - sigmas * std_temp or current_temp > mean_temp + sigmas * std_temp
+
@@ -1,67 +1,30 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import requests
-from sklearn.linear_model import LinearRegression
 import datetime
+import asyncio
+import os
+import uuid
+from analysis import DETECTORS, analyze_all_cities, anomality_check, month_to_season, two_sigmas, window
+from executor import analyze_cities
+from data_cache import content_hash, load_temperature_data
+from city_index import CityIndex
+from bounds import SeasonalBounds
+from geocache import GeoCache
+from weather_cache import TTLCache, coordinates_key
+from charts import time_series_figure
+from aggregates import aggregate_city, box_figure, histogram_figure
+from sweep import SIGMAS, WINDOWS, sweep_summary, sweep_thresholds
+from weather_async import LAT_LON_URL, TEMP_URL, fetch_current_temperatures, current_anomalies_table
+from profiling import StageProfiler, mark_cache_miss
 
 API_KEY_PLACEHOLDER = "Enter your OpenWeatherMap API key here"
-LAT_LON_URL = 'http://api.openweathermap.org/geo/1.0/direct'
-TEMP_URL = "https://api.openweathermap.org/data/2.5/weather"
-two_sigmas = 2  ### интервал для аномалий
-window = 30  ### окно скользящего среднего
-
-month_to_season = {12: "winter", 1: "winter", 2: "winter",
-                   3: "spring", 4: "spring", 5: "spring",
-                   6: "summer", 7: "summer", 8: "summer",
-                   9: "autumn", 10: "autumn", 11: "autumn"}
+PROFILE_BY_DEFAULT = os.getenv("TEMPERATURE_APP_PROFILE") == "1"
 
 current_date = datetime.date.today()
 current_season = month_to_season[current_date.month]
 
 
-def analyze_city(city_df: pd.DataFrame,  ### должны подавать только отсортированные по дате данные (для rolling)
-                 window: int = 30):
-    city_df = city_df.sort_values(by="timestamp")
-    ### скользящее среднее и стандартное отклонение по всему городу
-    city_df["rolling_mean"] = city_df["temperature"].rolling(window=window).mean()
-    city_df["rolling_std"] = city_df["temperature"].rolling(window=window).std()
-
-    ### аномалии по скользящему среднему
-    city_df["is_anomaly"] = city_df.apply(lambda row:
-                                          row['temperature'] > row["rolling_mean"] + two_sigmas * row["rolling_std"]
-                                          or
-                                          row['temperature'] < row["rolling_mean"] - two_sigmas * row["rolling_std"],
-                                          axis=1)
-
-    ### avg, min, max температуры по городу за все время
-    avg_temp = city_df["temperature"].mean()
-    min_temp = city_df["temperature"].min()
-    max_temp = city_df["temperature"].max()
-
-    ### статистика по сезонам
-    city_season_df = city_df.groupby("season")["temperature"].agg(season_avg_temp="mean",
-                                                                  season_std_temp="std").reset_index()
-
-    ### тренд
-    X = pd.DataFrame((city_df["timestamp"] - city_df["timestamp"].min()).dt.days)
-    y = city_df["temperature"]
-
-    model = LinearRegression()
-    model.fit(X, y)
-    # y_pred = model.predict(X)
-    trend = "positive" if model.coef_[0] > 0 else "negative"
-
-    return {
-        "avg_temp": avg_temp,
-        "min_temp": min_temp,
-        "max_temp": max_temp,
-        "seasonal_profile": city_season_df,
-        "trend": trend,
-        "anomalies": city_df[city_df.is_anomaly == True]
-    }
-
-
 ### хотим делать все запросы внутри одной сессии, чтобы сократить накладные расходы на переподключения
 def get_city_lat_lon(city: str,
                      session: requests.Session,
@@ -102,47 +65,129 @@ def get_city_current_temperature(lat: float,
         raise Exception(f"Error fetching current temperature: {response.status_code}, {response.text}")
 
 
-### проверяем на аномальность текущую температуру с профилем сезона
-def anomality_check(current_temp: float,
-                    seasonal_profile: pd.DataFrame,
-                    season: str):
+def fetch_current_temperature(lat: float,
+                              lon: float,
+                              api_key: str):
+    ### своя сессия: фоновое обновление кэша переживает сессию, открытую в main
+    with requests.Session() as session:
+        return get_city_current_temperature(lat, lon, session, api_key)
+
+
+### координаты городов не меняются, поэтому геокодинг кэшируем на диске (один кэш на все сессии)
+@st.cache_resource
+def get_geocache():
+    return GeoCache()
+
+
+### текущая погода общая для всех сессий и живет WEATHER_TTL секунд
+@st.cache_resource
+def get_weather_cache():
+    return TTLCache()
+
+
+### индекс по городам строится один раз на загруженный файл
+@st.cache_resource(max_entries=4)
+def get_city_index(key: str,
+                   _df: pd.DataFrame):
+    mark_cache_miss("city_index")
+    return CityIndex(_df)
+
+
+### границы нормы по (город, сезон) тоже считаются один раз на загруженный файл
+@st.cache_resource(max_entries=4)
+def get_seasonal_bounds(key: str,
+                        _df: pd.DataFrame,
+                        sigmas: float):
+    mark_cache_miss("seasonal_bounds")
+    return SeasonalBounds(_df, sigmas=sigmas)
+
+
+@st.cache_data(max_entries=32)
+def get_city_aggregates(key: str,
+                        city: str,
+                        start_date: pd.Timestamp,
+                        end_date: pd.Timestamp,
+                        _city_data: pd.DataFrame):
+    mark_cache_miss("aggregates")
+    return aggregate_city(_city_data)
+
+
+@st.cache_data(max_entries=16)
+def get_threshold_sweep(key: str,
+                        _df: pd.DataFrame,
+                        windows: tuple,
+                        sigma_values: tuple):
+    mark_cache_miss("sweep")
+    return sweep_thresholds(_df, list(windows), list(sigma_values))
+
+
+def show_profile(report: dict,
+                 log_path):
     '''
-    Определяем, является ли текущая температура аномальной.
+    Разбивка времени прогона по этапам и попадания в кэши.
     '''
-    season_df = seasonal_profile[seasonal_profile["season"] == season]
-    mean_temp = season_df["season_avg_temp"].values[0]
-    std_temp = season_df["season_std_temp"].values[0]
-
-    return current_temp < mean_temp - two_sigmas * std_temp or current_temp > mean_temp + two_sigmas * std_temp
+    with st.sidebar.expander("Profiling", expanded=True):
+        stages = pd.DataFrame({"seconds": report["stages"]}).sort_values("seconds", ascending=False)
+        stages["share"] = stages["seconds"] / report["total"]
+        st.write(f"**Run total:** {report['total']:.3f} s")
+        st.dataframe(stages.style.format({"seconds": "{:.3f}", "share": "{:.1%}"}))
+        caches = pd.DataFrame(report["caches"]).T.fillna(0).astype(int)
+        if not caches.empty:
+            st.write("**Cache hits / misses**")
+            st.dataframe(caches)
+        st.caption(f"Appended to {log_path}")
 
 
 def main():
+    geocache = get_geocache()
+    weather_cache = get_weather_cache()
+
     ### сайдбар для вводных
     st.sidebar.title("Temperature App Settings")
+
+    ### профилирование включается вручную (или TEMPERATURE_APP_PROFILE=1), без него замеры не делаются
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    profiler = StageProfiler(enabled=st.sidebar.checkbox("Profile this session", value=PROFILE_BY_DEFAULT),
+                             session_id=st.session_state.session_id)
+
     uploaded_file = st.sidebar.file_uploader("Upload historical temperature data (CSV)", type="csv")
     if uploaded_file:
-        df = pd.read_csv(uploaded_file, parse_dates=["timestamp"])
-
-        cities = df["city"].unique()
+        with profiler.stage("load_csv"):
+            data = uploaded_file.getvalue()
+            ### хэш файла считаем один раз за прогон - он же ключ всех кэшей по датасету
+            data_key = content_hash(data)
+            df = load_temperature_data(data, data_key)
+            city_index = profiler.cached("city_index", get_city_index, data_key, df)
+
+        cities = city_index.cities
         city = st.sidebar.selectbox("Select a city for analysis", cities)
 
-        min_date = df[df.city == city]["timestamp"].min().date()
-        max_date = df[df.city == city]["timestamp"].max().date()
+        min_date, max_date = (bound.date() for bound in city_index.date_bounds(city))
 
         st.sidebar.write(f"**Data Range:** {min_date} to {max_date}")
 
         start_date = st.sidebar.date_input("Start Date", value=min_date)
         end_date = st.sidebar.date_input("End Date", value=max_date)
 
+        ### параметры аномалий (подобрать можно в панели перебора порогов ниже)
+        rolling_window = st.sidebar.number_input("Rolling window (days)", min_value=2, max_value=365, value=window)
+        sigmas = st.sidebar.number_input("Anomaly threshold (σ)", min_value=0.5, max_value=5.0,
+                                         value=float(two_sigmas), step=0.5)
+        detector = st.sidebar.selectbox("Anomaly detector", DETECTORS,
+                                        format_func={"mean_std": "Rolling mean ± σ",
+                                                     "median_mad": "Rolling median ± MAD (robust)"}.get)
+
         api_key = st.sidebar.text_input("OpenWeatherMap API Key", type="password")
 
         current_temp = None
         ### Нынешняя температура
         if api_key:
-            with requests.Session() as session:
+            with profiler.stage("openweathermap"), requests.Session() as session:
                 try:
-                    lat, lon = get_city_lat_lon(city, session, api_key)
-                    current_temp = get_city_current_temperature(lat, lon, session, api_key)
+                    lat, lon = geocache.resolve(city, lambda name: get_city_lat_lon(name, session, api_key))
+                    current_temp = weather_cache.get(coordinates_key(lat, lon, api_key),
+                                                     lambda: fetch_current_temperature(lat, lon, api_key))
                 except Exception as e:
                     st.error(str(e))
         else:
@@ -151,9 +196,12 @@ def main():
         if st.sidebar.button("Analyze") and current_temp:
             start_date = pd.to_datetime(start_date)
             end_date = pd.to_datetime(end_date)
-            city_data = df[(df["city"] == city) & (df["timestamp"].between(start_date, end_date))]
+            with profiler.stage("filter"):
+                city_data = city_index.slice(city, start_date, end_date)
 
-            result = analyze_city(city_data)
+            with profiler.stage("analyze"):
+                result = analyze_all_cities(city_data, window=rolling_window, sigmas=sigmas,
+                                            detector=detector)[city]
             seasonal_profile = result["seasonal_profile"]
             anomalies = result["anomalies"]
 
@@ -161,7 +209,7 @@ def main():
             st.subheader(f"Temperature Analysis for {city}")
 
             anomaly_status = "not normal" if anomality_check(current_temp, seasonal_profile,
-                                                             current_season) else "normal"
+                                                             current_season, sigmas=sigmas) else "normal"
             if anomaly_status == 'normal':
                 st.success(
                     f"**Current temperature** of {current_temp:.2f}°C in {city} is {anomaly_status} for the {current_season}.")
@@ -172,60 +220,92 @@ def main():
             st.write(f"**Average Temperature:** {result['avg_temp']:.2f}°C")
             st.write(f"**Minimum Temperature:** {result['min_temp']:.2f}°C")
             st.write(f"**Maximum Temperature:** {result['max_temp']:.2f}°C")
-            st.write(f"**Temperature Trend throughout chosen period:** {result['trend']}")
+            st.write(f"**Temperature Trend throughout chosen period:** {result['trend']} "
+                     f"({result['trend_per_decade']:+.2f}°C/decade)")
 
             ### Описательная статистика
             st.subheader("Descriptive Statistics")
 
+            ### агрегаты считаются один раз на (файл, город, период), графики строятся из них, а не из строк
+            with profiler.stage("aggregates"):
+                aggregates = profiler.cached("aggregates", get_city_aggregates, data_key, city, start_date, end_date,
+                                             city_data)
+
             st.write(f"**Summary**")
-            st.dataframe(city_data.describe())
-            st.dataframe(city_data.describe(include='object'))
-
-            histogram = px.histogram(
-                city_data,
-                x="temperature",
-                nbins=30,
-                histnorm="probability",
-                title="Temperature Distribution",
-                labels={"temperature": "Temperature (°C)"},
-                color_discrete_sequence=['#80b1d3']
-            )
-            st.plotly_chart(histogram)
+            st.dataframe(aggregates["describe"])
+            st.dataframe(aggregates["describe_object"])
+
+            with profiler.stage("plotly"):
+                st.plotly_chart(histogram_figure(aggregates["histogram"]))
 
             ### Профиль сезона
             st.subheader("Seasonal Profile")
             st.write(f"**Seasonal statistics**")
             st.dataframe(seasonal_profile)
-            fig = px.box(
-                city_data,
-                x="season",
-                y="temperature",
-                color="season",
-                title="Seasonal Temperature Distribution",
-                labels={"season": "Season", "temperature": "Temperature (°C)"},
-                color_discrete_sequence=['#80b1d3','#ffffb3','#ccebc5','#fb8072']
-            )
-            st.plotly_chart(fig)
+            with profiler.stage("plotly"):
+                st.plotly_chart(box_figure(aggregates["boxes"]))
 
             ### Температурный временной ряд
             st.subheader("Temperature Time Series with Anomalies")
-            fig = px.line(city_data,
-                          x="timestamp",
-                          y="temperature",
-                          title="Temperature Time Series",
-                          labels={"timestamp": "Date", "temperature": "Temperature (°C)"},
-                          color_discrete_sequence=['#80b1d3']
-                          )
-            fig.add_scatter(x=anomalies["timestamp"],
-                            y=anomalies["temperature"],
-                            mode="markers",
-                            marker=dict(color="red", size=6),
-                            name="Anomalies")
-            st.plotly_chart(fig)
+            with profiler.stage("plotly"):
+                fig, payload = time_series_figure(city_data, anomalies)
+                st.caption(f"Chart payload: {payload['points_before']} → {payload['points_after']} points, "
+                           f"{payload['bytes_before'] / 1024:.0f} KB → {payload['bytes_after'] / 1024:.0f} KB"
+                           f"{' (WebGL)' if payload['webgl'] else ''}")
+                st.plotly_chart(fig)
 
             ### Датафрейм с аномалиями
             st.write(f"**Anomalies**")
             st.dataframe(anomalies)
 
+        ### Сводка по всем городам (бэкенд выбирается по объему данных и числу ядер)
+        if st.sidebar.button("Analyze all cities"):
+            with profiler.stage("analyze_all"):
+                results = analyze_cities(df, window=rolling_window, sigmas=sigmas, backend="auto")
+            summary = pd.DataFrame({
+                city: {
+                    "avg_temp": result["avg_temp"],
+                    "min_temp": result["min_temp"],
+                    "max_temp": result["max_temp"],
+                    "trend": result["trend"],
+                    "anomalies": len(result["anomalies"])
+                }
+                for city, result in results.items()
+            }).T
+            st.subheader("All Cities Summary")
+            st.dataframe(summary)
+
+        ### Текущие температуры всех городов одним асинхронным пакетом запросов
+        if st.sidebar.button("Check all cities now") and api_key:
+            all_cities = list(cities)
+            with profiler.stage("openweathermap_all"):
+                current_temps, errors = asyncio.run(fetch_current_temperatures(all_cities, api_key,
+                                                                               geocache=geocache))
+            for failed_city, error in errors.items():
+                st.error(f"{failed_city}: {error}")
+            st.subheader(f"Current Anomalies ({current_season})")
+            seasonal_bounds = profiler.cached("seasonal_bounds", get_seasonal_bounds, data_key, df, sigmas)
+            st.dataframe(current_anomalies_table(current_temps, seasonal_bounds, current_season))
+
+        ### Перебор окна и порога за один проход по всем городам
+        with st.expander("Anomaly threshold sweep"):
+            windows = st.multiselect("Windows (days)", [7, 14, 30, 60, 90, 180], default=WINDOWS)
+            sigma_values = st.multiselect("Sigma multipliers", [1.0, 1.5, 2.0, 2.5, 3.0, 3.5], default=SIGMAS)
+            ### тело expander выполняется при каждом rerun даже в свернутом виде, поэтому перебор только по запросу
+            run_sweep = st.checkbox("Run sweep", key="run_sweep")
+            if run_sweep and windows and sigma_values:
+                with profiler.stage("sweep"):
+                    sweep = profiler.cached("sweep", get_threshold_sweep, data_key, df, tuple(sorted(windows)),
+                                            tuple(sorted(sigma_values)))
+                st.write("**Anomaly rate across all cities**")
+                st.dataframe(sweep_summary(sweep).style.format("{:.2%}"))
+                st.write(f"**Anomaly rate for {city}**")
+                city_sweep = sweep[sweep["city"] == city].pivot(index="window", columns="sigmas", values="anomaly_rate")
+                st.dataframe(city_sweep.style.format("{:.2%}"))
+
+    report = profiler.write()
+    if report is not None:
+        show_profile(report, profiler.log_path)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
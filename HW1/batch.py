@@ -0,0 +1,119 @@
+'''
+Headless-анализ всего датасета для ночных задач:
+
+    python -m batch temperature_data.csv --output-dir report --cities Moscow London --window 30 --sigmas 2
+'''
+import argparse
+import time
+from contextlib import contextmanager
+from pathlib import Path
+import pandas as pd
+from analysis import two_sigmas, window
+from data_cache import parse_temperature_csv
+from executor import BACKENDS, analyze_cities
+from trend import batch_trends
+
+
+@contextmanager
+def stage(name: str,
+          timings: dict):
+    start_time = time.perf_counter()
+    yield
+    timings[name] = time.perf_counter() - start_time
+    print(f"[{name}] {timings[name]:.3f} s")
+
+
+def read_temperature_file(path: Path):
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    return parse_temperature_csv(path.read_bytes())
+
+
+def filter_data(df: pd.DataFrame,
+                cities: list = None,
+                start_date: str = None,
+                end_date: str = None):
+    mask = pd.Series(True, index=df.index)
+    if cities:
+        mask &= df["city"].isin(cities)
+    if start_date:
+        mask &= df["timestamp"] >= pd.Timestamp(start_date)
+    if end_date:
+        mask &= df["timestamp"] <= pd.Timestamp(end_date)
+    return df[mask]
+
+
+def build_report(df: pd.DataFrame,
+                 results: dict):
+    '''
+    Раскладываем результаты analyze_city по городам в плоские таблицы.
+    '''
+    summary = pd.DataFrame([{
+        "city": city,
+        "avg_temp": result["avg_temp"],
+        "min_temp": result["min_temp"],
+        "max_temp": result["max_temp"],
+        "trend": result["trend"],
+        "trend_per_decade": result["trend_per_decade"],
+        "anomalies": len(result["anomalies"])
+    } for city, result in results.items()])
+    seasonal_profiles = pd.concat({city: result["seasonal_profile"] for city, result in results.items()},
+                                  names=["city", None]).reset_index(level=0).reset_index(drop=True)
+    anomalies = pd.concat([result["anomalies"] for result in results.values()], ignore_index=True)
+    season_trends = batch_trends(df, by=("city", "season")).reset_index()
+    return {
+        "summary": summary,
+        "seasonal_profiles": seasonal_profiles,
+        "season_trends": season_trends,
+        "anomalies": anomalies
+    }
+
+
+def write_report(report: dict,
+                 output_dir: Path,
+                 output_format: str):
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for name, table in report.items():
+        ### категории и даты приводим к простым типам, чтобы файлы читались любыми инструментами
+        table = table.astype({column: str for column in table.select_dtypes("category").columns})
+        if output_format == "parquet":
+            table.to_parquet(output_dir / f"{name}.parquet", index=False)
+        else:
+            table.to_json(output_dir / f"{name}.json", orient="records", date_format="iso", indent=2)
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Analyze temperature history for all cities and write a report")
+    parser.add_argument("path", type=Path, help="CSV or Parquet file with city, timestamp, temperature, season")
+    parser.add_argument("--output-dir", type=Path, default=Path("report"))
+    parser.add_argument("--format", dest="output_format", choices=["parquet", "json"], default="parquet")
+    parser.add_argument("--cities", nargs="+", help="analyze only these cities")
+    parser.add_argument("--window", type=int, default=window, help="rolling window in days")
+    parser.add_argument("--sigmas", type=float, default=two_sigmas, help="anomaly threshold in rolling std")
+    parser.add_argument("--start-date", help="YYYY-MM-DD, inclusive")
+    parser.add_argument("--end-date", help="YYYY-MM-DD, inclusive")
+    parser.add_argument("--backend", choices=BACKENDS + ("auto",), default="auto")
+    parser.add_argument("--workers", type=int, help="worker count for thread/process backends")
+    args = parser.parse_args(argv)
+
+    timings = {}
+    with stage("load", timings):
+        df = read_temperature_file(args.path)
+    with stage("filter", timings):
+        df = filter_data(df, args.cities, args.start_date, args.end_date)
+    if df.empty:
+        parser.error("no rows left after filtering")
+    with stage("analyze", timings):
+        results = analyze_cities(df, window=args.window, sigmas=args.sigmas,
+                                 backend=args.backend, max_workers=args.workers)
+    with stage("report", timings):
+        report = build_report(df, results)
+    with stage("write", timings):
+        write_report(report, args.output_dir, args.output_format)
+
+    print(f"{len(results)} cities, {len(df)} rows -> {args.output_dir} ({sum(timings.values()):.3f} s total)")
+    return timings
+
+
+if __name__ == "__main__":
+    main()
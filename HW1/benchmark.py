@@ -0,0 +1,164 @@
+'''
+Воспроизводимые замеры анализа на синтетических данных:
+
+    python benchmark.py --save-baseline         # записать benchmark_baseline.json
+    python benchmark.py --compare               # сравнить с базовой линией, код возврата 1 при регрессии
+'''
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from analysis import analyze_all_cities, analyze_city, anomality_check
+from bounds import SeasonalBounds
+from data_cache import parse_temperature_csv
+from executor import analyze_cities
+from synthetic import generate_temperature_data
+
+BASELINE_PATH = Path(__file__).parent / "benchmark_baseline.json"
+TOLERANCE = 0.25  ### допустимое замедление относительно базовой линии
+NOISE_FLOOR = 50e-6  ### разницы меньше 50 мкс - джиттер таймера и планировщика, а не изменение кода
+REPEAT = 20
+ENVIRONMENT_KEYS = ("python", "pandas", "numpy", "cpu_count")  ### замеры сравнимы только в одинаковом окружении
+
+
+def build_cases(df: pd.DataFrame):
+    '''
+    Сценарии замеров: имя -> функция без аргументов.
+    '''
+    csv_bytes = df.to_csv(index=False).encode()
+    city = df["city"].iloc[0]
+    city_df = df[df["city"] == city]
+    profiles = {name: result["seasonal_profile"] for name, result in analyze_all_cities(df).items()}
+    current_temps = dict(zip(profiles, np.linspace(-20, 40, len(profiles))))
+    bounds = SeasonalBounds(df)
+
+    return {
+        "load_csv_read_csv": lambda: pd.read_csv(io.BytesIO(csv_bytes), parse_dates=["timestamp"]),
+        "load_csv_typed": lambda: parse_temperature_csv(csv_bytes),
+        "analyze_city": lambda: analyze_city(city_df.copy()),
+        "analyze_all_cities": lambda: analyze_all_cities(df),
+        "strategy_sequential": lambda: analyze_cities(df, backend="sequential"),
+        "strategy_thread": lambda: analyze_cities(df, backend="thread"),
+        "strategy_process": lambda: analyze_cities(df, backend="process"),
+        "anomality_check": lambda: [anomality_check(current_temps[name], profile, "winter")
+                                    for name, profile in profiles.items()],
+        "check_many": lambda: bounds.check_many(list(current_temps), list(current_temps.values()), "winter"),
+    }
+
+
+def measure(function,
+            repeat: int):
+    function()  ### прогрев: импорты, кэши pandas
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start_time)
+    return {
+        "median": float(np.percentile(times, 50)),
+        "p5": float(np.percentile(times, 5)),
+        "p95": float(np.percentile(times, 95)),
+        "repeat": repeat
+    }
+
+
+def run(n_cities: int,
+        n_years: int,
+        repeat: int,
+        seed: int,
+        only: list = None):
+    df = generate_temperature_data(n_cities=n_cities, n_years=n_years, seed=seed)
+    cases = build_cases(df)
+    results = {}
+    for name, function in cases.items():
+        if only and name not in only:
+            continue
+        results[name] = measure(function, repeat)
+        print(f"{name:<22} median {results[name]['median']:.4f} s  "
+              f"[{results[name]['p5']:.4f}, {results[name]['p95']:.4f}]")
+    return {
+        "meta": {
+            "n_cities": n_cities,
+            "n_years": n_years,
+            "rows": len(df),
+            "seed": seed,
+            "python": sys.version.split()[0],
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "results": results
+    }
+
+
+def environment_mismatch(current: dict,
+                         baseline: dict):
+    '''
+    Возвращаем {ключ: (базовая линия, сейчас)} для различающихся версий и числа ядер.
+    '''
+    return {key: (baseline["meta"].get(key), current["meta"][key])
+            for key in ENVIRONMENT_KEYS
+            if baseline["meta"].get(key) != current["meta"][key]}
+
+
+def compare(current: dict,
+            baseline: dict,
+            tolerance: float = TOLERANCE,
+            noise_floor: float = NOISE_FLOOR):
+    '''
+    Возвращаем список регрессий.
+    Регрессия - даже самые быстрые прогоны (p5) медленнее самых медленных прогонов базовой линии (p95)
+    больше чем на tolerance, и медиана выросла больше чем на tolerance и хотя бы на noise_floor секунд.
+    Порог относительный, поэтому ловит и замедление сценариев в доли миллисекунды; одна шумная медиана гейт не валит.
+    '''
+    regressions = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        base = baseline["results"][name]
+        ratio = result["median"] / base["median"]
+        slower = (result["p5"] > base["p95"] * (1 + tolerance)
+                  and ratio > 1 + tolerance
+                  and result["median"] - base["median"] > noise_floor)
+        status = "REGRESSION" if slower else "ok"
+        print(f"{name:<22} x{ratio:.2f} vs baseline  {status}")
+        if status != "ok":
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the temperature analysis on synthetic data")
+    parser.add_argument("--cities", type=int, default=15)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", help="run only these benchmarks")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--noise-floor", type=float, default=NOISE_FLOOR, help="seconds")
+    args = parser.parse_args()
+
+    current = run(args.cities, args.years, args.repeat, args.seed, args.only)
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(current, indent=2))
+        print(f"Baseline saved to {args.baseline}")
+    if args.compare:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["meta"]["rows"] != current["meta"]["rows"]:
+            parser.error("baseline was recorded on a different dataset size")
+        mismatch = environment_mismatch(current, baseline)
+        if mismatch:
+            details = ", ".join(f"{key}: {old} -> {new}" for key, (old, new) in mismatch.items())
+            parser.error(f"baseline was recorded in a different environment ({details}); "
+                         f"re-record it with --save-baseline on this machine")
+        sys.exit(1 if compare(current, baseline, args.tolerance, args.noise_floor) else 0)
@@ -0,0 +1,81 @@
+import threading
+import numpy as np
+import pandas as pd
+from analysis import SEASONS, two_sigmas
+
+
+class SeasonalBounds:
+    '''
+    Предрасчитанная таблица (город, сезон) -> (нижняя, верхняя граница нормы) в виде массивов numpy.
+    Проверка любого числа текущих температур - одна векторная операция без фильтрации DataFrame.
+    '''
+
+    def __init__(self,
+                 df: pd.DataFrame = None,
+                 sigmas: float = two_sigmas):
+        self.sigmas = sigmas
+        self._lock = threading.Lock()
+        self.cities = pd.Index([])
+        self.lower = np.empty((0, len(SEASONS)))
+        self.upper = np.empty((0, len(SEASONS)))
+        if df is not None:
+            self.reload(df)
+
+    @classmethod
+    def from_profiles(cls,
+                      seasonal_profiles: dict,
+                      sigmas: float = two_sigmas):
+        '''
+        Строим таблицу из {город: seasonal_profile} в формате analyze_city.
+        '''
+        bounds = cls(sigmas=sigmas)
+        profiles = pd.concat(seasonal_profiles, names=["city"]).reset_index(level=0)
+        bounds._set(profiles.set_index(["city", "season"]))
+        return bounds
+
+    def _set(self,
+             stats: pd.DataFrame):
+        mean = stats["season_avg_temp"].unstack("season").reindex(columns=SEASONS)
+        std = stats["season_std_temp"].unstack("season").reindex(columns=SEASONS)
+        lower = (mean - self.sigmas * std).to_numpy(dtype=np.float64)
+        upper = (mean + self.sigmas * std).to_numpy(dtype=np.float64)
+        ### подменяем все массивы разом, чтобы параллельные проверки не увидели половину обновления
+        with self._lock:
+            self.cities, self.lower, self.upper = pd.Index(mean.index.astype(str)), lower, upper
+
+    def reload(self,
+               df: pd.DataFrame):
+        '''
+        Пересчитываем границы по новой истории (city, season, temperature).
+        '''
+        stats = df.groupby(["city", "season"], observed=True)["temperature"].agg(season_avg_temp="mean",
+                                                                                 season_std_temp="std")
+        self._set(stats)
+
+    def bounds(self,
+               city: str,
+               season: str):
+        row = self.cities.get_loc(city)
+        column = SEASONS.index(season)
+        return self.lower[row, column], self.upper[row, column]
+
+    def check_many(self,
+                   cities,
+                   temps,
+                   season):
+        '''
+        Аномальность вектора текущих температур. season - один сезон для всех или массив сезонов.
+        Для сезона без истории (NaN границы) температура считается нормальной, как у anomality_check с NaN.
+        '''
+        with self._lock:
+            city_index, lower, upper = self.cities, self.lower, self.upper
+        rows = city_index.get_indexer(pd.Index(np.asarray(cities, dtype=object)))
+        if (rows < 0).any():
+            unknown = np.asarray(cities, dtype=object)[rows < 0]
+            raise KeyError(f"No history for cities: {list(unknown[:10])}")
+        columns = pd.Index(SEASONS).get_indexer(np.atleast_1d(np.asarray(season, dtype=object)))
+        if (columns < 0).any():
+            raise KeyError(f"Unknown season: {season}")
+
+        temps = np.asarray(temps, dtype=np.float64)
+        return (temps < lower[rows, columns]) | (temps > upper[rows, columns])
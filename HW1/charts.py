@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+MAX_POINTS = 2000  ### бюджет точек линии, которые уходят в браузер
+WEBGL_THRESHOLD = 5000  ### начиная с этого числа точек рисуем через WebGL (scattergl)
+
+
+def lttb(x: np.ndarray,
+         y: np.ndarray,
+         n_out: int):
+    '''
+    Largest-Triangle-Three-Buckets: индексы n_out точек, сохраняющих форму ряда.
+    Первая и последняя точки сохраняются всегда.
+    '''
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    ### границы n_out - 2 внутренних корзин
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        ### третья вершина треугольника - среднее следующей корзины
+        next_start, next_stop = stop, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+
+        areas = np.abs((x[previous] - avg_x) * (y[start:stop] - y[previous])
+                       - (x[previous] - x[start:stop]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample_with_anomalies(timestamps: pd.Series,
+                              temperatures: pd.Series,
+                              is_anomaly: np.ndarray,
+                              max_points: int = MAX_POINTS):
+    '''
+    Индексы точек для линии: LTTB по бюджету плюс все аномалии (их нельзя потерять на графике).
+    '''
+    x = timestamps.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    selected = lttb(x, temperatures.to_numpy(), max_points)
+    return np.union1d(selected, np.flatnonzero(is_anomaly))
+
+
+def _payload_sizes(fig: go.Figure):
+    '''
+    Размер JSON фигуры и размеры JSON каждого трейса.
+    Трейсы и layout сериализуем по отдельности, но ровно один раз - сумма совпадает с len(fig.to_json()).
+    '''
+    fig_dict = fig.to_dict()
+    traces = [len(pio.json.to_json_plotly(trace).encode()) for trace in fig_dict["data"]]
+    layout = len(pio.json.to_json_plotly(fig_dict["layout"]).encode())
+    ### обвязка {"data":[...],"layout":...} и запятые между трейсами
+    framing = len('{"data":[],"layout":}') + max(len(traces) - 1, 0)
+    return framing + sum(traces) + layout, traces
+
+
+def time_series_figure(city_data: pd.DataFrame,
+                       anomalies: pd.DataFrame,
+                       max_points: int = MAX_POINTS,
+                       webgl_threshold: int = WEBGL_THRESHOLD):
+    '''
+    График температурного ряда с аномалиями.
+    Возвращаем фигуру и статистику объема данных до/после прореживания (объем до - оценка).
+    '''
+    city_data = city_data.sort_values(by="timestamp")
+    is_anomaly = city_data.index.isin(anomalies.index)
+    selected = downsample_with_anomalies(city_data["timestamp"], city_data["temperature"], is_anomaly, max_points)
+    line_data = city_data.iloc[selected]
+
+    scatter = go.Scattergl if len(city_data) > webgl_threshold else go.Scatter
+    fig = go.Figure()
+    fig.add_trace(scatter(x=line_data["timestamp"],
+                          y=line_data["temperature"],
+                          mode="lines",
+                          line=dict(color='#80b1d3'),
+                          name="Temperature"))
+    fig.add_trace(scatter(x=anomalies["timestamp"],
+                          y=anomalies["temperature"],
+                          mode="markers",
+                          marker=dict(color="red", size=6),
+                          name="Anomalies"))
+    fig.update_layout(title="Temperature Time Series",
+                      xaxis_title="Date",
+                      yaxis_title="Temperature (°C)")
+
+    ### фигуру сериализуем один раз, объем до прореживания оцениваем по среднему размеру точки линии
+    bytes_after, trace_sizes = _payload_sizes(fig)
+    bytes_per_point = trace_sizes[0] / max(len(line_data), 1)
+
+    stats = {
+        "points_before": len(city_data),
+        "points_after": len(line_data),
+        "bytes_before": int(bytes_after + (len(city_data) - len(line_data)) * bytes_per_point),
+        "bytes_after": bytes_after,
+        "webgl": scatter is go.Scattergl
+    }
+    return fig, stats
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+
+class CityIndex:
+    '''
+    Индекс, который строится один раз на загрузку: данные отсортированы по (город, дата),
+    у каждого города непрерывный диапазон строк, поэтому выборка периода - это два бинарных поиска и срез.
+    '''
+
+    def __init__(self,
+                 df: pd.DataFrame):
+        self.df = df.sort_values(by=["city", "timestamp"], kind="stable")
+        self.timestamps = self.df["timestamp"].to_numpy(dtype="datetime64[ns]")
+
+        cities = self.df["city"].to_numpy()
+        ### начало диапазона каждого города - первая строка, где город сменился
+        starts = np.flatnonzero(np.r_[True, cities[1:] != cities[:-1]]) if len(cities) else np.array([], dtype=np.int64)
+        stops = np.r_[starts[1:], len(cities)]
+        self.ranges = {cities[start]: (int(start), int(stop)) for start, stop in zip(starts, stops)}
+        self.cities = list(pd.unique(df["city"]))  ### порядок первого появления, как в исходном файле
+
+        ### границы дат по каждому городу
+        self.bounds = {city: (pd.Timestamp(self.timestamps[start]), pd.Timestamp(self.timestamps[stop - 1]))
+                       for city, (start, stop) in self.ranges.items()}
+
+    def date_bounds(self,
+                    city: str):
+        return self.bounds[city]
+
+    def city_frame(self,
+                   city: str):
+        start, stop = self.ranges[city]
+        return self.df.iloc[start:stop]
+
+    def slice(self,
+              city: str,
+              start_date,
+              end_date):
+        '''
+        Строки города с датами в [start_date, end_date] (как Series.between) за O(log n), срез без копирования.
+        '''
+        start, stop = self.ranges[city]
+        city_timestamps = self.timestamps[start:stop]
+        left = np.searchsorted(city_timestamps, np.datetime64(pd.Timestamp(start_date), "ns"), side="left")
+        right = np.searchsorted(city_timestamps, np.datetime64(pd.Timestamp(end_date), "ns"), side="right")
+        return self.df.iloc[start + left:start + right]
@@ -0,0 +1,156 @@
+import tracemalloc
+import numpy as np
+import pandas as pd
+from analysis import SEASONS, two_sigmas, window
+
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+class TemperatureData:
+    '''
+    Компактное представление датасета: коды городов и сезонов, float32 температуры, int32 дни от 1970-01-01.
+    Строки отсортированы по (город, дата), у каждого города непрерывный диапазон [start, stop).
+    Пока это отдельный путь: app.py и batch.py работают с DataFrame из data_cache, замер экономии - python compact.py.
+    '''
+
+    def __init__(self,
+                 cities: list,
+                 city_codes: np.ndarray,
+                 season_codes: np.ndarray,
+                 days: np.ndarray,
+                 temperature: np.ndarray):
+        order = np.lexsort((days, city_codes))
+        self.cities = list(cities)
+        self.city_codes = city_codes[order]
+        self.season_codes = season_codes[order]
+        self.days = days[order]
+        self.temperature = temperature[order]
+
+        bounds = np.searchsorted(self.city_codes, np.arange(len(self.cities) + 1))
+        self.ranges = {city: (int(bounds[i]), int(bounds[i + 1])) for i, city in enumerate(self.cities)}
+
+    @classmethod
+    def from_frame(cls,
+                   df: pd.DataFrame):
+        city = pd.Categorical(df["city"])
+        season = pd.Categorical(df["season"], categories=SEASONS)
+        days = (df["timestamp"].to_numpy(dtype="datetime64[D]") - EPOCH).astype(np.int32)
+        return cls(cities=[str(name) for name in city.categories],
+                   city_codes=city.codes.astype(np.int16 if len(city.categories) < 2 ** 15 else np.int32),
+                   season_codes=season.codes.astype(np.int8),
+                   days=days,
+                   temperature=df["temperature"].to_numpy(dtype=np.float32))
+
+    @classmethod
+    def read_csv(cls,
+                 path):
+        df = pd.read_csv(path,
+                         dtype={"city": "category", "season": "category", "temperature": np.float32})
+        df["timestamp"] = pd.to_datetime(df["timestamp"], format="ISO8601")
+        return cls.from_frame(df)
+
+    @property
+    def nbytes(self):
+        return self.city_codes.nbytes + self.season_codes.nbytes + self.days.nbytes + self.temperature.nbytes
+
+    def to_frame(self,
+                 city: str = None):
+        '''
+        DataFrame в формате исходного CSV (для analyze_city и графиков), целиком или по одному городу.
+        '''
+        start, stop = self.ranges[city] if city is not None else (0, len(self.days))
+        return pd.DataFrame({
+            "city": pd.Categorical.from_codes(self.city_codes[start:stop], categories=self.cities),
+            "timestamp": (EPOCH + self.days[start:stop]).astype("datetime64[ns]"),
+            "temperature": self.temperature[start:stop],
+            "season": pd.Categorical.from_codes(self.season_codes[start:stop], categories=SEASONS),
+        })
+
+
+class RollingAnomalies:
+    '''
+    Производные ряды analyze_city (скользящие среднее/СКО и флаг аномалии) в заранее выделенных массивах,
+    выровненных со строками TemperatureData, - без добавления колонок в DataFrame.
+    '''
+
+    def __init__(self,
+                 data: TemperatureData):
+        n = len(data.temperature)
+        self.rolling_mean = np.empty(n, dtype=np.float32)
+        self.rolling_std = np.empty(n, dtype=np.float32)
+        self.is_anomaly = np.empty(n, dtype=bool)
+
+    @property
+    def nbytes(self):
+        return self.rolling_mean.nbytes + self.rolling_std.nbytes + self.is_anomaly.nbytes
+
+    def compute(self,
+                data: TemperatureData,
+                window: int = window,
+                sigmas: float = two_sigmas):
+        for start, stop in data.ranges.values():
+            ### считаем в float64 по одному городу, временный буфер - размером с город, а не с весь датасет
+            rolling = pd.Series(data.temperature[start:stop], dtype=np.float64).rolling(window=window)
+            self.rolling_mean[start:stop] = rolling.mean().to_numpy()
+            self.rolling_std[start:stop] = rolling.std().to_numpy()
+
+        deviation = sigmas * self.rolling_std
+        np.logical_or(data.temperature > self.rolling_mean + deviation,
+                      data.temperature < self.rolling_mean - deviation,
+                      out=self.is_anomaly)
+        return self
+
+
+def peak_allocated(function):
+    '''
+    Результат вызова и пиковый объем памяти, выделенной во время него (numpy и pandas отчитываются в tracemalloc).
+    '''
+    tracemalloc.start()
+    try:
+        result = function()
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def rolling_columns(df: pd.DataFrame,
+                    window: int = window,
+                    sigmas: float = two_sigmas):
+    '''
+    Те же производные ряды, что analyze_all_cities добавляет колонками DataFrame (для сравнения в memory_report).
+    df должен быть отсортирован по (city, timestamp).
+    '''
+    rolling = df.groupby("city", sort=False, observed=True)["temperature"].rolling(window=window)
+    rolling_mean = rolling.mean().reset_index(level=0, drop=True)
+    rolling_std = rolling.std().reset_index(level=0, drop=True)
+    temperature = df["temperature"]
+    is_anomaly = ((temperature > rolling_mean + sigmas * rolling_std)
+                  | (temperature < rolling_mean - sigmas * rolling_std))
+    return pd.DataFrame({"rolling_mean": rolling_mean, "rolling_std": rolling_std, "is_anomaly": is_anomaly})
+
+
+def memory_report(path):
+    '''
+    Сравниваем память текущего пути (read_csv + колонки rolling_mean/rolling_std/is_anomaly)
+    и компактного представления (TemperatureData + RollingAnomalies) на одних и тех же производных рядах.
+    derived series - сколько занимают готовые ряды, derived peak - пик выделенной памяти во время их расчета.
+    '''
+    df = pd.read_csv(path, parse_dates=["timestamp"])
+    old_frame = df.memory_usage(deep=True).sum()
+    df = df.sort_values(by=["city", "timestamp"], kind="stable")
+    columns, old_peak = peak_allocated(lambda: rolling_columns(df))
+    old_derived = columns.memory_usage(index=False).sum()
+
+    data = TemperatureData.read_csv(path)
+    derived, new_peak = peak_allocated(lambda: RollingAnomalies(data).compute(data))
+
+    report = pd.DataFrame({
+        "old_bytes": [old_frame, old_derived, old_peak, old_frame + old_derived],
+        "new_bytes": [data.nbytes, derived.nbytes, new_peak, data.nbytes + derived.nbytes],
+    }, index=["dataset", "derived series", "derived peak", "total"])
+    report["ratio"] = report["old_bytes"] / report["new_bytes"]
+    return report
+
+
+if __name__ == "__main__":
+    print(memory_report("temperature_data.csv"))
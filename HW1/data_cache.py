@@ -0,0 +1,99 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import pandas as pd
+from profiling import CacheStats
+
+CACHE_DIR = Path(os.getenv("TEMPERATURE_CACHE_DIR", Path(__file__).parent / ".cache" / "uploads"))
+MEMORY_CACHE_ENTRIES = 4  ### сколько загруженных датасетов держим в памяти
+DISK_CACHE_BYTES = 512 * 1024 ** 2  ### лимит на размер parquet-кэша на диске
+
+CATEGORY_COLUMNS = ["city", "season"]
+
+_memory_cache = OrderedDict()
+stats = CacheStats("uploads")  ### memory_hit / disk_hit / miss - для панели профилирования
+_lock = threading.Lock()
+
+
+def content_hash(data: bytes):
+    '''
+    Ключ кэша - хэш содержимого файла (имя файла не важно).
+    '''
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def parse_temperature_csv(data: bytes):
+    '''
+    Разбираем CSV в типизированный вид: категории для city/season, даты в datetime64.
+    '''
+    df = pd.read_csv(io.BytesIO(data), dtype={column: "category" for column in CATEGORY_COLUMNS})
+    ### формат дат в выгрузке фиксированный (ISO), поэтому не даем pandas угадывать его построчно
+    df["timestamp"] = pd.to_datetime(df["timestamp"], format="ISO8601")
+    return df
+
+
+def _evict_disk_cache(max_bytes: int):
+    '''
+    Удаляем давно не использованные файлы, пока кэш не уложится в лимит.
+    '''
+    files = sorted(CACHE_DIR.glob("*.parquet"), key=lambda path: path.stat().st_mtime)
+    total = sum(path.stat().st_size for path in files)
+    for path in files:
+        if total <= max_bytes:
+            break
+        total -= path.stat().st_size
+        path.unlink(missing_ok=True)
+
+
+def _remember(key: str,
+              df: pd.DataFrame):
+    _memory_cache[key] = df
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > MEMORY_CACHE_ENTRIES:
+        _memory_cache.popitem(last=False)
+
+
+def load_temperature_data(data: bytes,
+                          key: str = None):
+    '''
+    Загружаем исторические данные: память -> parquet на диске -> разбор CSV.
+    key - уже посчитанный content_hash(data), чтобы не хэшировать файл повторно.
+    Возвращаемый DataFrame общий для всех повторных загрузок, его нельзя изменять на месте.
+    '''
+    key = key or content_hash(data)
+    with _lock:
+        if key in _memory_cache:
+            _memory_cache.move_to_end(key)
+            stats["memory_hit"] += 1
+            return _memory_cache[key]
+
+    path = CACHE_DIR / f"{key}.parquet"
+    df = None
+    if path.exists():
+        try:
+            df = pd.read_parquet(path)
+            path.touch()  ### обновляем время доступа для LRU-вытеснения
+        except FileNotFoundError:
+            pass  ### файл успела вытеснить другая сессия между проверкой и чтением
+    disk_hit = df is not None
+    if not disk_hit:
+        df = parse_temperature_csv(data)
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        ### у каждой записи свой временный файл: все сессии Streamlit живут в одном процессе
+        with tempfile.NamedTemporaryFile(dir=CACHE_DIR, prefix=f"{key}.", suffix=".tmp", delete=False) as tmp_file:
+            tmp_path = Path(tmp_file.name)
+        try:
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)  ### атомарно, чтобы параллельные сессии не прочитали недописанный файл
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        _evict_disk_cache(DISK_CACHE_BYTES)
+
+    with _lock:
+        stats["disk_hit" if disk_hit else "miss"] += 1
+        _remember(key, df)
+    return df
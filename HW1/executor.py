@@ -0,0 +1,174 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from analysis import analyze_all_cities, two_sigmas
+
+BACKENDS = ("sequential", "thread", "process")  ### sequential - один векторный проход analyze_all_cities в этом процессе
+### векторный проход - ~0.8 мкс на строку, запуск пула и копия в разделяемую память - ~0.15 с + ~0.3 мкс на строку,
+### поэтому процессы окупаются только на миллионах строк
+PROCESS_MIN_ROWS = 1_000_000
+
+### разделяемая память, к которой подключается каждый рабочий процесс
+_worker_shm = None
+_worker_arrays = None
+
+
+def choose_backend(n_rows: int,
+                   n_cities: int,
+                   cpu_count: int = None):
+    '''
+    Выбираем бэкенд по объему данных и числу ядер.
+    '''
+    cpu_count = cpu_count or os.cpu_count() or 1
+    if cpu_count > 1 and n_cities > 1 and n_rows >= PROCESS_MIN_ROWS:
+        return "process"
+    return "sequential"
+
+
+def _city_groups(cities: list,
+                 n_groups: int):
+    '''
+    Делим города на n_groups подряд идущих групп: одна задача рабочему - один векторный проход по группе.
+    '''
+    return [list(group) for group in np.array_split(np.asarray(cities, dtype=object), n_groups) if len(group)]
+
+
+def _pack_cities(df: pd.DataFrame):
+    '''
+    Раскладываем данные в непрерывные массивы, отсортированные по городу и дате.
+    '''
+    df = df.sort_values(by=["city", "timestamp"], kind="stable")
+    cities = pd.Categorical(df["city"])
+    seasons = pd.Categorical(df["season"])
+    arrays = {
+        "timestamp": df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64),
+        "temperature": df["temperature"].to_numpy(dtype=np.float64),
+        "city": cities.codes.astype(np.int32),
+        "season": seasons.codes.astype(np.int8),
+    }
+    ### границы городов - точки смены города в отсортированных строках (порядок категорий может быть не алфавитным)
+    names = df["city"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, names[1:] != names[:-1]]) if len(names) else np.array([], dtype=np.int64)
+    stops = np.r_[starts[1:], len(names)]
+    city_slices = {names[start]: (int(start), int(stop)) for start, stop in zip(starts, stops)}
+    categories = {"city": list(cities.categories), "season": list(seasons.categories)}
+    dtypes = {column: df[column].dtype for column in ("city", "timestamp", "season")}
+    return arrays, city_slices, categories, dtypes, df.index.to_numpy()
+
+
+def _rows_frame(start: int,
+                stop: int,
+                arrays: dict,
+                categories: dict,
+                dtypes: dict):
+    '''
+    Собираем DataFrame строк [start, stop) из массивов (формат исходного CSV).
+    dtypes - исходные типы city/timestamp/season, чтобы результат не зависел от бэкенда (категории остаются категориями).
+    '''
+    return pd.DataFrame({
+        "city": pd.Categorical.from_codes(arrays["city"][start:stop], categories=categories["city"]),
+        "timestamp": arrays["timestamp"][start:stop].view("datetime64[ns]"),
+        "temperature": arrays["temperature"][start:stop],
+        "season": pd.Categorical.from_codes(arrays["season"][start:stop], categories=categories["season"]),
+    }).astype(dtypes)
+
+
+def _attach_shared_memory(name: str,
+                          layout: dict):
+    global _worker_shm, _worker_arrays
+    if sys.version_info >= (3, 13):
+        _worker_shm = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        _worker_shm = shared_memory.SharedMemory(name=name)
+    _worker_arrays = {
+        key: np.ndarray(shape, dtype=dtype, buffer=_worker_shm.buf, offset=offset)
+        for key, (offset, shape, dtype) in layout.items()
+    }
+
+
+def _analyze_shared_rows(start: int,
+                         stop: int,
+                         categories: dict,
+                         dtypes: dict,
+                         window: int,
+                         sigmas: float):
+    ### в процесс передаются только границы среза, сами данные читаются из разделяемой памяти
+    rows_df = _rows_frame(start, stop, _worker_arrays, categories, dtypes)
+    return analyze_all_cities(rows_df, window=window, sigmas=sigmas)
+
+
+def _run_process(df: pd.DataFrame,
+                 window: int,
+                 sigmas: float,
+                 max_workers: int):
+    arrays, city_slices, categories, dtypes, index = _pack_cities(df)
+
+    layout = {}
+    offset = 0
+    for key, array in arrays.items():
+        offset = -(-offset // 8) * 8  ### выравниваем по 8 байт
+        layout[key] = (offset, array.shape, array.dtype.str)
+        offset += array.nbytes
+
+    ### города группы идут в отсортированных массивах подряд, поэтому группа - один непрерывный срез
+    groups = [(city_slices[group[0]][0], city_slices[group[-1]][1])
+              for group in _city_groups(list(city_slices), max_workers)]
+
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    try:
+        for key, array in arrays.items():
+            start, shape, dtype = layout[key]
+            np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)[:] = array
+
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_attach_shared_memory,
+                                 initargs=(shm.name, layout)) as executor:
+            futures = {(start, stop): executor.submit(_analyze_shared_rows, start, stop, categories, dtypes,
+                                                      window, sigmas)
+                       for start, stop in groups}
+            group_results = {rows: future.result() for rows, future in futures.items()}
+    finally:
+        shm.close()
+        shm.unlink()
+
+    ### возвращаем исходные индексы строк, как при расчете в этом процессе
+    results = {}
+    for (start, stop), group_result in group_results.items():
+        for city, result in group_result.items():
+            result["anomalies"].index = index[start:stop][result["anomalies"].index]
+            results[city] = result
+    return {city: results[city] for city in city_slices}
+
+
+def analyze_cities(df: pd.DataFrame,
+                   window: int = 30,
+                   sigmas: float = two_sigmas,
+                   backend: str = "auto",
+                   max_workers: int = None):
+    '''
+    Анализируем все города выбранным бэкендом: sequential - analyze_all_cities в этом процессе,
+    thread/process - тот же векторный расчет по группам городов в пуле потоков или процессов.
+    Возвращаем словарь {город: результат в формате analyze_city}.
+    '''
+    cities = df["city"].unique()
+    if backend == "auto":
+        backend = choose_backend(len(df), len(cities))
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}. Expected one of {BACKENDS} or 'auto'.")
+
+    max_workers = max_workers or min(len(cities), os.cpu_count() or 1)
+
+    if backend == "process":
+        return _run_process(df, window, sigmas, max_workers)
+
+    if backend == "thread":
+        groups = _city_groups(list(cities), max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(analyze_all_cities, df[df["city"].isin(group)], window, sigmas)
+                       for group in groups]
+            return {city: result for future in futures for city, result in future.result().items()}
+
+    return analyze_all_cities(df, window=window, sigmas=sigmas)
@@ -0,0 +1,128 @@
+import argparse
+import asyncio
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import pandas as pd
+from profiling import CacheStats
+
+GEOCACHE_PATH = Path(os.getenv("GEOCACHE_PATH", Path(__file__).parent / ".cache" / "geocode.sqlite"))
+LRU_SIZE = 1024
+
+
+def normalize_city(city: str):
+    '''
+    "  new   York " и "New York" - один и тот же ключ.
+    '''
+    return " ".join(city.split()).casefold()
+
+
+class GeoCache:
+    '''
+    Координаты городов: LRU в памяти процесса поверх таблицы SQLite на диске.
+    Координаты не меняются, поэтому записи не устаревают.
+    '''
+
+    def __init__(self,
+                 path: Path = GEOCACHE_PATH,
+                 lru_size: int = LRU_SIZE):
+        self.path = Path(path)
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = CacheStats("geocode")  ### memory_hit / disk_hit / miss
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        ### одно соединение на процесс, доступ из потоков Streamlit сериализуем блокировкой
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS coordinates "
+                                 "(city TEXT PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL)")
+        self._connection.commit()
+
+    def _remember(self,
+                  key: str,
+                  value: tuple):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def get(self,
+            city: str):
+        key = normalize_city(city)
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.stats["memory_hit"] += 1
+                return self._lru[key]
+            row = self._connection.execute("SELECT lat, lon FROM coordinates WHERE city = ?", (key,)).fetchone()
+            if row is not None:
+                self._remember(key, row)
+            self.stats["disk_hit" if row is not None else "miss"] += 1
+            return row
+
+    def put(self,
+            city: str,
+            lat: float,
+            lon: float):
+        key = normalize_city(city)
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO coordinates VALUES (?, ?, ?)", (key, lat, lon))
+            self._connection.commit()
+            self._remember(key, (lat, lon))
+
+    def resolve(self,
+                city: str,
+                fetch):
+        '''
+        Берем координаты из кэша, при промахе - через fetch(city) с сохранением результата.
+        '''
+        coordinates = self.get(city)
+        if coordinates is None:
+            coordinates = fetch(city)
+            self.put(city, *coordinates)
+        return coordinates
+
+    def missing(self,
+                cities: list):
+        return [city for city in cities if self.get(city) is None]
+
+
+async def prepopulate(cities: list,
+                      api_key: str,
+                      cache: GeoCache):
+    '''
+    Один раз разрешаем координаты всех еще не закэшированных городов.
+    '''
+    import aiohttp
+    from weather_async import MAX_CONCURRENCY, REQUEST_TIMEOUT, async_get_city_lat_lon
+
+    missing = cache.missing(cities)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)) as session:
+        results = await asyncio.gather(*[async_get_city_lat_lon(city, session, semaphore, api_key)
+                                         for city in missing], return_exceptions=True)
+
+    errors = {}
+    for city, result in zip(missing, results):
+        if isinstance(result, Exception):
+            errors[city] = str(result)
+        else:
+            cache.put(city, *result)
+    return len(missing) - len(errors), errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-populate the geocoding cache with all cities from a CSV")
+    parser.add_argument("csv_path")
+    parser.add_argument("--api-key", default=os.getenv("OPENWEATHERMAP_API_KEY"))
+    args = parser.parse_args()
+    if not args.api_key:
+        parser.error("--api-key or OPENWEATHERMAP_API_KEY is required")
+
+    cities = pd.read_csv(args.csv_path, usecols=["city"])["city"].unique().tolist()
+    resolved, errors = asyncio.run(prepopulate(cities, args.api_key, GeoCache()))
+    print(f"Resolved {resolved} new cities, {len(cities) - resolved - len(errors)} already cached")
+    for city, error in errors.items():
+        print(f"{city}: {error}")
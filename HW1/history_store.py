@@ -0,0 +1,279 @@
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from analysis import SEASONS, analyze_city, month_to_season
+
+MAGIC = b"TEMPHIST"
+VERSION = 2  ### 2 - у записи города есть счетчик поколений
+ALIGN = 64  ### начала блоков выравниваем по кэш-линии
+MAX_CITIES = 1024
+NAME_BYTES = 64
+
+PREFIX_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"), ("max_cities", "<u4"), ("n_cities", "<u4")])
+### generation - seqlock записи: нечетный, пока писатель меняет смещение, длину или емкость
+CITY_DTYPE = np.dtype([("name", f"S{NAME_BYTES}"), ("generation", "<u8"), ("offset", "<u8"), ("length", "<u8"),
+                       ("capacity", "<u8")])
+### в блоке города подряд лежат capacity меток времени (int64, нс), температур (float64) и кодов сезонов (int8)
+ROW_BYTES = 8 + 8 + 1
+
+SEASON_CODES = {season: code for code, season in enumerate(SEASONS)}
+MONTH_TO_SEASON_CODE = np.array([0] + [SEASON_CODES[month_to_season[month]] for month in range(1, 13)], dtype=np.int8)
+
+
+def _align(size: int):
+    return (size + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _index_offset():
+    return _align(PREFIX_DTYPE.itemsize)
+
+
+def _data_offset(max_cities: int):
+    return _align(_index_offset() + max_cities * CITY_DTYPE.itemsize)
+
+
+class HistoryStore:
+    '''
+    История температур по городам в одном файле, который отображается в память (np.memmap).
+    Заголовок - таблица (город, смещение, длина, емкость), дальше у каждого города свой непрерывный блок
+    с метками времени, температурами и сезонами. Открытие файла ничего не читает, страницы подгружает ОС,
+    и несколько процессов, открывших один файл, делят одни и те же страницы page cache.
+    Писатель должен быть один (mode="r+"), читателей - сколько угодно (mode="r"): запись города меняется
+    под счетчиком поколений, и читатель перечитывает ее, пока не увидит согласованные смещение, длину и емкость.
+    Блок, перенесенный при росте, остается в файле: читатели могут еще держать его представления, поэтому место
+    не переиспользуется. Чтобы вернуть его, есть compact - копия хранилища с блоками по фактической длине.
+    '''
+
+    def __init__(self,
+                 path,
+                 mode: str = "r"):
+        if mode not in ("r", "r+"):
+            raise ValueError(f"Unknown mode: {mode}. Expected 'r' or 'r+'.")
+        self.path = Path(path)
+        self.mode = mode
+        self._remap()
+        if self._prefix["magic"] != MAGIC or self._prefix["version"] != VERSION:
+            raise ValueError(f"{self.path} is not a temperature history store (version {VERSION})")
+
+    @classmethod
+    def create(cls,
+               path,
+               max_cities: int = MAX_CITIES):
+        '''
+        Пустое хранилище с заголовком на max_cities городов.
+        '''
+        path = Path(path)
+        prefix = np.zeros(1, dtype=PREFIX_DTYPE)
+        prefix["magic"], prefix["version"], prefix["max_cities"] = MAGIC, VERSION, max_cities
+        with open(path, "wb") as file:
+            file.write(prefix.tobytes())
+            file.truncate(_data_offset(max_cities))
+        return cls(path, mode="r+")
+
+    @classmethod
+    def from_frame(cls,
+                   path,
+                   df: pd.DataFrame,
+                   max_cities: int = MAX_CITIES):
+        '''
+        Переносим DataFrame в формате исходного CSV (city, timestamp, temperature, season) в новое хранилище.
+        '''
+        store = cls.create(path, max_cities=max(max_cities, df["city"].nunique()))
+        df = df.sort_values(by=["city", "timestamp"], kind="stable")
+        for city, city_df in df.groupby("city", sort=False, observed=True):
+            store.append(str(city), city_df["timestamp"], city_df["temperature"], city_df["season"])
+        store.flush()
+        return store
+
+    def _remap(self):
+        self._mm = np.memmap(self.path, dtype=np.uint8, mode=self.mode)
+        self._prefix = self._mm[:PREFIX_DTYPE.itemsize].view(PREFIX_DTYPE)[0]
+        max_cities = int(self._prefix["max_cities"])
+        index_offset = _index_offset()
+        self._index = self._mm[index_offset:index_offset + max_cities * CITY_DTYPE.itemsize].view(CITY_DTYPE)
+        self._slots = {name.decode(): slot
+                       for slot, name in enumerate(self._index["name"][:int(self._prefix["n_cities"])])}
+
+    def refresh(self):
+        '''
+        Перечитываем заголовок и переотображаем файл, если писатель добавил города или увеличил файл.
+        '''
+        if self.path.stat().st_size != len(self._mm) or int(self._prefix["n_cities"]) != len(self._slots):
+            self._remap()
+
+    @property
+    def cities(self):
+        return list(self._slots)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self,
+                     city: str):
+        return city in self._slots
+
+    def _block(self,
+               offset: int,
+               capacity: int):
+        timestamps = self._mm[offset:offset + 8 * capacity].view(np.int64)
+        temperature = self._mm[offset + 8 * capacity:offset + 16 * capacity].view(np.float64)
+        season = self._mm[offset + 16 * capacity:offset + 17 * capacity].view(np.int8)
+        return timestamps, temperature, season
+
+    def arrays(self,
+               city: str):
+        '''
+        Метки времени (datetime64[ns]), температуры и коды сезонов города - представления страниц файла без копирования.
+        '''
+        if city not in self._slots:
+            self.refresh()
+        entry = self._index[self._slots[city]]
+        while True:
+            generation = int(entry["generation"])
+            offset, length, capacity = int(entry["offset"]), int(entry["length"]), int(entry["capacity"])
+            ### поколение четное и не изменилось за чтение - писатель не трогал запись между нашими чтениями
+            if generation % 2 == 0 and int(entry["generation"]) == generation:
+                break
+        if offset + capacity * ROW_BYTES > len(self._mm):
+            self._remap()
+        timestamps, temperature, season = self._block(offset, capacity)
+        return timestamps[:length].view("datetime64[ns]"), temperature[:length], season[:length]
+
+    def city_frame(self,
+                   city: str):
+        '''
+        DataFrame города для analyze_city (timestamp, temperature, season) поверх отображенных массивов.
+        Категории сезонов - по алфавиту, как у CSV, прочитанного с dtype category: от их порядка зависит
+        порядок строк сезонного профиля, и он должен совпадать с путем через CSV.
+        '''
+        timestamps, temperature, season = self.arrays(city)
+        season = pd.Categorical.from_codes(season, categories=SEASONS, validate=False)
+        return pd.DataFrame({
+            "timestamp": timestamps,
+            "temperature": temperature,
+            "season": season.reorder_categories(sorted(SEASONS)),
+        }, copy=False)
+
+    @staticmethod
+    def _update_entry(entry,
+                      **fields):
+        '''
+        Меняем поля записи города так, чтобы читатель не увидел их вперемешку (seqlock).
+        '''
+        entry["generation"] += 1
+        for field, value in fields.items():
+            entry[field] = value
+        entry["generation"] += 1
+
+    def _allocate(self,
+                  capacity: int):
+        '''
+        Новый блок в конце файла; файл растет, поэтому отображение приходится пересоздать.
+        '''
+        offset = _align(len(self._mm))
+        self._mm.flush()
+        with open(self.path, "r+b") as file:
+            file.truncate(offset + _align(capacity * ROW_BYTES))
+        self._remap()
+        return offset
+
+    def append(self,
+               city: str,
+               timestamps,
+               temperatures,
+               seasons=None):
+        '''
+        Дописываем наблюдения города (по возрастанию времени, позже уже сохраненных).
+        Если сезоны не переданы, они считаются по месяцу. Блок, в который данные не помещаются,
+        переносится в конец файла с удвоенной емкостью.
+        '''
+        if self.mode != "r+":
+            raise ValueError("History store is opened read-only, reopen it with mode='r+' to append")
+        timestamps = pd.to_datetime(np.asarray(timestamps)).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        temperatures = np.asarray(temperatures, dtype=np.float64)
+        if seasons is None:
+            season_codes = MONTH_TO_SEASON_CODE[pd.DatetimeIndex(timestamps.view("datetime64[ns]")).month]
+        else:
+            season_codes = pd.Categorical(np.asarray(seasons), categories=SEASONS).codes.astype(np.int8)
+        if not len(timestamps) == len(temperatures) == len(season_codes):
+            raise ValueError("timestamps, temperatures and seasons must have the same length")
+        if (season_codes < 0).any():
+            raise ValueError(f"Unknown season, expected one of {SEASONS}")
+        if (np.diff(timestamps) < 0).any():
+            raise ValueError("timestamps must be sorted")
+
+        if city not in self._slots:
+            slot = len(self._slots)
+            if slot >= int(self._prefix["max_cities"]):
+                raise ValueError(f"History store is full ({slot} cities)")
+            name = city.encode()
+            if len(name) > NAME_BYTES:
+                raise ValueError(f"City name is longer than {NAME_BYTES} bytes: {city}")
+            capacity = max(len(timestamps), 1)
+            offset = self._allocate(capacity)
+            entry = self._index[slot]
+            ### запись станет видна читателям только после увеличения n_cities
+            entry["name"], entry["generation"] = name, 0
+            entry["offset"], entry["length"], entry["capacity"] = offset, 0, capacity
+            self._prefix["n_cities"] = slot + 1
+            self._slots[city] = slot
+
+        entry = self._index[self._slots[city]]
+        offset, length, capacity = int(entry["offset"]), int(entry["length"]), int(entry["capacity"])
+        old_timestamps, old_temperature, old_season = self._block(offset, capacity)
+        if length and len(timestamps) and timestamps[0] < old_timestamps[length - 1]:
+            raise ValueError(f"New observations of {city} must not be earlier than the stored ones")
+
+        new_length = length + len(timestamps)
+        if new_length > capacity:
+            new_capacity = max(2 * capacity, new_length)
+            new_offset = self._allocate(new_capacity)
+            old_timestamps, old_temperature, old_season = self._block(offset, capacity)
+            new_blocks = self._block(new_offset, new_capacity)
+            for new, old in zip(new_blocks, (old_timestamps, old_temperature, old_season)):
+                new[:length] = old[:length]
+            entry = self._index[self._slots[city]]
+            offset, capacity = new_offset, new_capacity
+
+        block_timestamps, block_temperature, block_season = self._block(offset, capacity)
+        block_timestamps[length:new_length] = timestamps
+        block_temperature[length:new_length] = temperatures
+        block_season[length:new_length] = season_codes
+        ### запись города обновляем последней: читатель не увидит недописанные строки
+        self._update_entry(entry, offset=offset, length=new_length, capacity=capacity)
+
+    def flush(self):
+        self._mm.flush()
+
+    def compact(self,
+                path):
+        '''
+        Копия хранилища без перенесенных блоков и запаса емкости; исходный файл не меняется.
+        '''
+        store = type(self).create(path, max_cities=int(self._prefix["max_cities"]))
+        for city in self.cities:
+            timestamps, temperature, season = self.arrays(city)
+            store.append(city, timestamps, temperature, np.asarray(SEASONS)[season])
+        store.flush()
+        return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a temperature CSV into a memory-mapped history store")
+    parser.add_argument("csv_path")
+    parser.add_argument("store_path")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv_path, parse_dates=["timestamp"])
+    HistoryStore.from_frame(args.store_path, df)
+
+    start_time = time.perf_counter()
+    store = HistoryStore(args.store_path)
+    frames = {city: store.city_frame(city) for city in store.cities}
+    print(f"Opened {len(store)} cities in {time.perf_counter() - start_time:.4f} s")
+
+    start_time = time.perf_counter()
+    results = {city: analyze_city(frame) for city, frame in frames.items()}
+    print(f"analyze_city over the store took {time.perf_counter() - start_time:.2f} s")
@@ -0,0 +1,166 @@
+import json
+import math
+import pandas as pd
+from analysis import month_to_season, two_sigmas
+from trend import DAYS_PER_DECADE
+
+
+class OnlineAnomalyDetector:
+    '''
+    Инкрементальный аналог analyze_city для одного города: наблюдения подаются по одному, в порядке дат.
+    Скользящие среднее/СКО обновляются за O(1) через кольцевой буфер,
+    сезонная статистика и тренд - через накопленные моменты (алгоритм Уэлфорда).
+    '''
+
+    def __init__(self,
+                 window: int = 30,
+                 sigmas: float = two_sigmas):
+        self.window = window
+        self.sigmas = sigmas
+
+        ### кольцевой буфер последних window температур
+        self.buffer = [0.0] * window
+        self.position = 0
+        self.filled = 0
+        self.rolling_mean = 0.0
+        self.rolling_m2 = 0.0
+
+        ### статистика за все время
+        self.count = 0
+        self.min_temp = math.inf
+        self.max_temp = -math.inf
+        self.start_date = None
+
+        ### моменты для тренда: x - дни от первого наблюдения, y - температура
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.m2_x = 0.0
+        self.c_xy = 0.0
+
+        ### сезон -> [n, mean, m2]
+        self.seasons = {}
+
+    def _update_rolling(self,
+                        temperature: float):
+        if self.filled < self.window:
+            self.filled += 1
+            delta = temperature - self.rolling_mean
+            self.rolling_mean += delta / self.filled
+            self.rolling_m2 += delta * (temperature - self.rolling_mean)
+        else:
+            ### одно и то же окно: выбывает самое старое значение, добавляется новое
+            oldest = self.buffer[self.position]
+            old_mean = self.rolling_mean
+            self.rolling_mean += (temperature - oldest) / self.window
+            self.rolling_m2 += (temperature - oldest) * (temperature - self.rolling_mean + oldest - old_mean)
+            self.rolling_m2 = max(self.rolling_m2, 0.0)
+        self.buffer[self.position] = temperature
+        self.position = (self.position + 1) % self.window
+
+    def _update_trend(self,
+                      x: float,
+                      temperature: float):
+        dx = x - self.mean_x
+        self.mean_x += dx / self.count
+        self.mean_y += (temperature - self.mean_y) / self.count
+        self.m2_x += dx * (x - self.mean_x)
+        self.c_xy += dx * (temperature - self.mean_y)
+
+    def _update_season(self,
+                       season: str,
+                       temperature: float):
+        stats = self.seasons.setdefault(season, [0, 0.0, 0.0])
+        stats[0] += 1
+        delta = temperature - stats[1]
+        stats[1] += delta / stats[0]
+        stats[2] += delta * (temperature - stats[1])
+
+    @property
+    def rolling_std(self):
+        if self.filled < self.window or self.window < 2:
+            return math.nan
+        return math.sqrt(self.rolling_m2 / (self.window - 1))
+
+    def update(self,
+               timestamp,
+               temperature: float,
+               season: str = None):
+        '''
+        Добавляем наблюдение и сразу возвращаем, является ли оно аномалией по скользящему окну.
+        '''
+        timestamp = pd.Timestamp(timestamp)
+        season = season or month_to_season[timestamp.month]
+        if self.start_date is None:
+            self.start_date = timestamp
+
+        self.count += 1
+        self.min_temp = min(self.min_temp, temperature)
+        self.max_temp = max(self.max_temp, temperature)
+        self._update_rolling(temperature)
+        self._update_trend((timestamp - self.start_date).days, temperature)
+        self._update_season(season, temperature)
+
+        ### как и в analyze_city, окно включает текущее наблюдение, а неполное окно аномалий не дает
+        std = self.rolling_std
+        if math.isnan(std):
+            return False
+        return (temperature > self.rolling_mean + self.sigmas * std
+                or temperature < self.rolling_mean - self.sigmas * std)
+
+    @property
+    def slope(self):
+        return self.c_xy / self.m2_x if self.m2_x > 0 else 0.0
+
+    @property
+    def trend(self):
+        return "positive" if self.slope > 0 else "negative"
+
+    def seasonal_profile(self):
+        '''
+        Сезонный профиль в формате analyze_city.
+        '''
+        rows = [{"season": season,
+                 "season_avg_temp": mean,
+                 "season_std_temp": math.sqrt(m2 / (n - 1)) if n > 1 else math.nan}
+                for season, (n, mean, m2) in sorted(self.seasons.items())]
+        return pd.DataFrame(rows, columns=["season", "season_avg_temp", "season_std_temp"])
+
+    def summary(self):
+        return {
+            "avg_temp": self.mean_y,
+            "min_temp": self.min_temp,
+            "max_temp": self.max_temp,
+            "seasonal_profile": self.seasonal_profile(),
+            "trend": self.trend,
+            "trend_per_decade": self.slope * DAYS_PER_DECADE
+        }
+
+    def to_dict(self):
+        '''
+        Состояние детектора в JSON-совместимом виде (для чекпоинтов).
+        '''
+        state = dict(self.__dict__)
+        state["start_date"] = self.start_date.isoformat() if self.start_date is not None else None
+        return state
+
+    @classmethod
+    def from_dict(cls,
+                  state: dict):
+        detector = cls(window=state["window"], sigmas=state["sigmas"])
+        detector.__dict__.update(state)
+        detector.buffer = list(state["buffer"])
+        detector.seasons = {season: list(stats) for season, stats in state["seasons"].items()}
+        if state["start_date"] is not None:
+            detector.start_date = pd.Timestamp(state["start_date"])
+        return detector
+
+    def save(self,
+             path: str):
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file)
+
+    @classmethod
+    def load(cls,
+             path: str):
+        with open(path) as file:
+            return cls.from_dict(json.load(file))
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+PROFILE_LOG = Path(os.getenv("TEMPERATURE_PROFILE_LOG", Path(__file__).parent / ".cache" / "profile.jsonl"))
+
+### профайлер прогона, который сейчас идет в этом потоке: Streamlit выполняет прогон каждой сессии в своем потоке
+_active = threading.local()
+
+
+def _active_profiler():
+    return getattr(_active, "profiler", None)
+
+
+class CacheStats(Counter):
+    '''
+    Счетчики кэша, общего для всех сессий процесса (hit / miss / ...).
+    Каждое увеличение еще и засчитывается профайлеру прогона из этого потока,
+    поэтому в отчет сессии попадают только ее обращения, а не трафик соседних сессий.
+    '''
+
+    def __init__(self,
+                 name: str):
+        super().__init__()
+        self.name = name
+
+    def __setitem__(self,
+                    key,
+                    value):
+        delta = value - self[key]
+        super().__setitem__(key, value)
+        profiler = _active_profiler()
+        if profiler is not None and delta > 0:
+            profiler.caches[self.name][key] += delta
+
+
+def mark_cache_miss(name: str):
+    '''
+    Вызывается в теле функции под st.cache_data / st.cache_resource: тело выполняется только при промахе.
+    '''
+    profiler = _active_profiler()
+    if profiler is not None:
+        profiler.caches[name]["miss"] += 1
+
+
+class StageProfiler:
+    '''
+    Замеры одного прогона скрипта Streamlit: время по этапам и попадания/промахи кэшей.
+    Выключенный профайлер ничего не замеряет и не пишет.
+    '''
+
+    def __init__(self,
+                 enabled: bool = False,
+                 session_id: str = None,
+                 log_path: Path = PROFILE_LOG):
+        self.enabled = enabled
+        self.session_id = session_id or uuid.uuid4().hex
+        self.log_path = Path(log_path)
+        self.stages = {}
+        self.caches = defaultdict(Counter)  ### кэш -> события этой сессии за прогон
+        self._started = time.perf_counter()
+        ### новый прогон в потоке заменяет профайлер прерванного прогона
+        _active.profiler = self if enabled else None
+
+    @contextmanager
+    def stage(self,
+              name: str):
+        if not self.enabled:
+            yield
+            return
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            ### этап может выполняться несколько раз за прогон - суммируем
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start_time
+
+    def cached(self,
+               name: str,
+               function,
+               *args):
+        '''
+        Вызов функции под st.cache_data / st.cache_resource: если ее тело не отметило промах (mark_cache_miss),
+        значит, результат пришел из кэша Streamlit.
+        '''
+        misses = self.caches[name]["miss"]
+        result = function(*args)
+        if self.enabled and self.caches[name]["miss"] == misses:
+            self.caches[name]["hit"] += 1
+        return result
+
+    def report(self):
+        return {
+            "session_id": self.session_id,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "total": time.perf_counter() - self._started,
+            "stages": self.stages,
+            "caches": {name: dict(events) for name, events in self.caches.items() if events}
+        }
+
+    def write(self):
+        '''
+        Дописываем отчет прогона строкой JSON в лог, чтобы разбирать медленные сессии потом.
+        '''
+        if _active_profiler() is self:
+            _active.profiler = None
+        if not self.enabled:
+            return None
+        report = self.report()
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.log_path, "a") as file:
+            file.write(json.dumps(report) + "\n")
+        return report
@@ -0,0 +1,142 @@
+import bisect
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+MAD_SCALE = 1.4826  ### MAD * 1.4826 оценивает σ нормального распределения, поэтому порог в σ тот же, что у mean/std
+CHUNK_ROWS = 1 << 16  ### окна обрабатываем блоками, чтобы временная матрица была не больше CHUNK_ROWS × window
+SORTED_WINDOW_MIN = 128  ### с такого окна отсортированное окно (O(w) memmove + O(log w) поиск на шаг) быстрее np.median по окнам
+
+
+def _kth_deviations(window: list,
+                    split: int,
+                    median: float,
+                    k: int):
+    '''
+    (k-1)-е и k-е по возрастанию (с нуля) значения |x - median| для отсортированного окна.
+    Отклонения слева от split и справа от него - две отсортированные последовательности,
+    поэтому k-е из их объединения находим бинарным поиском по тому, сколько берем слева.
+    '''
+    n_left, n_right = split, len(window) - split
+    lo, hi = max(0, k + 1 - n_right), min(k + 1, n_left)
+    while True:
+        i = (lo + hi) // 2
+        j = k + 1 - i
+        if i > 0 and j < n_right and median - window[split - i] > window[split + j] - median:
+            hi = i - 1
+        elif j > 0 and i < n_left and window[split + j - 1] - median > median - window[split - 1 - i]:
+            lo = i + 1
+        else:
+            break
+    ### k + 1 наименьших - i слева и j справа; k-е - наибольшее из них, (k-1)-е - следующее за ним
+    left = median - window[split - i] if i > 0 else -np.inf
+    right = window[split + j - 1] - median if j > 0 else -np.inf
+    if left >= right:
+        return max(median - window[split - i + 1] if i > 1 else -np.inf, right), left
+    return max(left, window[split + j - 2] - median if j > 1 else -np.inf), right
+
+
+def _rolling_mad_sorted(values: np.ndarray,
+                        median: np.ndarray,
+                        window: int):
+    '''
+    MAD по отсортированному окну: вставка и удаление - bisect, медиана отклонений - _kth_deviations.
+    Поиск места - O(log w), но insort и del сдвигают хвост списка, так что шаг - O(w) (один memmove в C,
+    без сравнений в Python), против O(w) выборки с копированием у np.median.
+    '''
+    mad = np.full(len(values), np.nan)
+    values_list, median_list = values.tolist(), median.tolist()
+    current = sorted(values_list[:window - 1])
+    half = window // 2
+    for i in range(window - 1, len(values_list)):
+        bisect.insort(current, values_list[i])
+        previous, kth = _kth_deviations(current, bisect.bisect_left(current, median_list[i]), median_list[i], half)
+        mad[i] = kth if window % 2 else (previous + kth) / 2
+        del current[bisect.bisect_left(current, values_list[i - window + 1])]
+    return mad
+
+
+def _rolling_mad_vectorized(values: np.ndarray,
+                            median: np.ndarray,
+                            window: int):
+    '''
+    MAD через np.median по строкам sliding_window_view блоками: O(w) на окно, но без цикла в Python.
+    '''
+    mad = np.full(len(values), np.nan)
+    windows = sliding_window_view(values, window)  ### без копирования: (n - window + 1) × window
+    for start in range(0, len(windows), CHUNK_ROWS):
+        stop = min(start + CHUNK_ROWS, len(windows))
+        deviations = np.abs(windows[start:stop] - median[window - 1 + start:window - 1 + stop, None])
+        mad[window - 1 + start:window - 1 + stop] = np.median(deviations, axis=1)
+    return mad
+
+
+def rolling_median_mad(values: np.ndarray,
+                       window: int):
+    '''
+    Скользящие медиана и MAD одного ряда; для первых window - 1 точек - NaN, как у pandas rolling.
+    Медиана - pandas rolling median (skiplist, O(log w) на шаг).
+    MAD для коротких окон - векторный np.median по окнам (O(w) на шаг),
+    для окон от SORTED_WINDOW_MIN - отсортированное окно и поиск k-го отклонения
+    (O(log w) сравнений, но O(w) сдвиг списка на шаг).
+    Итого оба пути MAD - O(w) на шаг, и отставание от mean/std растет с окном (замер - python robust.py):
+    на встроенных данных x2.0 при w=30, x4.1 при w=90, x4.5 при w=365.
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    median = pd.Series(values).rolling(window=window).median().to_numpy()
+    if len(values) < window:
+        return median, np.full(len(values), np.nan)
+    ### NaN ломает порядок в отсортированном окне, такие ряды считаем векторно
+    if window >= SORTED_WINDOW_MIN and not np.isnan(values).any():
+        return median, _rolling_mad_sorted(values, median, window)
+    return median, _rolling_mad_vectorized(values, median, window)
+
+
+def resolution(values: np.ndarray):
+    '''
+    Шаг значений ряда - наименьшая разница между соседними различными значениями (1.0 для целых градусов).
+    '''
+    steps = np.diff(np.unique(values[~np.isnan(values)]))
+    return steps.min() if len(steps) else 0.0
+
+
+def robust_anomalies(df: pd.DataFrame,
+                     window: int,
+                     sigmas: float):
+    '''
+    Колонки rolling_median, rolling_mad и is_anomaly для данных, отсортированных по (city, timestamp).
+    Аномалия: |t - медиана| > sigmas * 1.4826 * MAD; окна не пересекают границы городов.
+    MAD не меньше шага значений города: на округленных данных больше половины окна часто совпадает, MAD == 0,
+    и без нижней границы аномалией было бы любое отличное от медианы значение.
+    '''
+    temperature = df["temperature"].to_numpy(dtype=np.float64)
+    median = np.empty(len(df))
+    mad = np.empty(len(df))
+
+    cities = df["city"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, cities[1:] != cities[:-1]]) if len(df) else np.array([], dtype=np.int64)
+    for start, stop in zip(starts, np.r_[starts[1:], len(df)].astype(np.int64)):
+        median[start:stop], mad[start:stop] = rolling_median_mad(temperature[start:stop], window)
+        np.maximum(mad[start:stop], resolution(temperature[start:stop]), out=mad[start:stop])
+
+    with np.errstate(invalid="ignore"):
+        is_anomaly = np.abs(temperature - median) > sigmas * MAD_SCALE * mad
+    return df.assign(rolling_median=median, rolling_mad=mad, is_anomaly=is_anomaly)
+
+
+if __name__ == "__main__":
+    import time
+    from analysis import analyze_all_cities
+
+    data = pd.read_csv("temperature_data.csv", parse_dates=["timestamp"])
+    for window_size in (30, 90, 365):
+        times = {}
+        for detector in ("mean_std", "median_mad"):
+            runs = []
+            for _ in range(3):
+                start_time = time.perf_counter()
+                analyze_all_cities(data, window=window_size, detector=detector)
+                runs.append(time.perf_counter() - start_time)
+            times[detector] = min(runs)
+        print(f"window {window_size:>3}: mean_std {times['mean_std']:.3f} s, median_mad {times['median_mad']:.3f} s "
+              f"(x{times['median_mad'] / times['mean_std']:.1f})")
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+from trend import DAYS_PER_DECADE
+
+CHUNKSIZE = 1_000_000  ### строк в одном чанке, память ограничена размером чанка, а не файла
+MOMENT_COLUMNS = ["n", "mean_x", "mean_y", "m2_x", "m2_y", "c_xy"]
+
+
+def _chunk_moments(chunk: pd.DataFrame,
+                   keys: list):
+    '''
+    Считаем моменты чанка по группам: количество, средние, центральные суммы квадратов и ковариации.
+    x - дни от 1970-01-01 (сдвиг x не меняет наклон тренда), y - температура.
+    '''
+    grouped = chunk.groupby(keys, sort=False, observed=True)
+    dx = chunk["x"] - grouped["x"].transform("mean")
+    dy = chunk["temperature"] - grouped["temperature"].transform("mean")
+    centered = pd.DataFrame({"m2_x": dx * dx, "m2_y": dy * dy, "c_xy": dx * dy})
+    for key in keys:
+        centered[key] = chunk[key]
+
+    moments = grouped.agg(n=("temperature", "size"),
+                          mean_x=("x", "mean"),
+                          mean_y=("temperature", "mean"),
+                          min_y=("temperature", "min"),
+                          max_y=("temperature", "max"))
+    sums = centered.groupby(keys, sort=False, observed=True)[["m2_x", "m2_y", "c_xy"]].sum()
+    return moments.join(sums)
+
+
+def _merge_moments(a: pd.DataFrame,
+                   b: pd.DataFrame):
+    '''
+    Объединяем моменты двух частей данных (параллельный вариант алгоритма Уэлфорда, Chan et al.).
+    '''
+    if a is None:
+        return b
+    a, b = a.align(b, join="outer")
+    na, nb = a["n"].fillna(0), b["n"].fillna(0)
+    a_moments, b_moments = a[MOMENT_COLUMNS].fillna(0), b[MOMENT_COLUMNS].fillna(0)
+
+    n = na + nb
+    weight = na * nb / n
+    dx = b_moments["mean_x"] - a_moments["mean_x"]
+    dy = b_moments["mean_y"] - a_moments["mean_y"]
+
+    return pd.DataFrame({
+        "n": n,
+        "mean_x": a_moments["mean_x"] + dx * nb / n,
+        "mean_y": a_moments["mean_y"] + dy * nb / n,
+        "min_y": np.fmin(a["min_y"], b["min_y"]),
+        "max_y": np.fmax(a["max_y"], b["max_y"]),
+        "m2_x": a_moments["m2_x"] + b_moments["m2_x"] + dx * dx * weight,
+        "m2_y": a_moments["m2_y"] + b_moments["m2_y"] + dy * dy * weight,
+        "c_xy": a_moments["c_xy"] + b_moments["c_xy"] + dx * dy * weight,
+    })
+
+
+def stream_moments(path: str,
+                   chunksize: int = CHUNKSIZE):
+    '''
+    Читаем CSV по чанкам и накапливаем моменты по городам и по (город, сезон).
+    '''
+    city_moments = None
+    season_moments = None
+    reader = pd.read_csv(path,
+                         chunksize=chunksize,
+                         usecols=["city", "timestamp", "temperature", "season"],
+                         dtype={"city": str, "season": str, "temperature": "float64"})
+    for chunk in reader:
+        timestamps = pd.to_datetime(chunk["timestamp"], format="ISO8601")
+        chunk["x"] = (timestamps - pd.Timestamp("1970-01-01")).dt.days.astype("float64")
+        city_moments = _merge_moments(city_moments, _chunk_moments(chunk, ["city"]))
+        season_moments = _merge_moments(season_moments, _chunk_moments(chunk, ["city", "season"]))
+    return city_moments, season_moments
+
+
+def stream_analyze_cities(path: str,
+                          chunksize: int = CHUNKSIZE):
+    '''
+    Потоковый аналог analyze_city для файлов, не помещающихся в память.
+    Возвращаем {город: avg/min/max, сезонный профиль и тренд} (без аномалий - для них нужен весь ряд).
+    '''
+    city_moments, season_moments = stream_moments(path, chunksize=chunksize)
+
+    season_profiles = pd.DataFrame({
+        "season_avg_temp": season_moments["mean_y"],
+        "season_std_temp": np.sqrt(season_moments["m2_y"] / (season_moments["n"] - 1)),
+    }).sort_index()
+
+    results = {}
+    for city, row in city_moments.sort_index().iterrows():
+        slope = row["c_xy"] / row["m2_x"]
+        results[city] = {
+            "count": int(row["n"]),
+            "avg_temp": row["mean_y"],
+            "min_temp": row["min_y"],
+            "max_temp": row["max_y"],
+            "seasonal_profile": season_profiles.loc[city].reset_index(),
+            "trend": "positive" if slope > 0 else "negative",
+            "trend_per_decade": slope * DAYS_PER_DECADE
+        }
+    return results
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+WINDOWS = [7, 14, 30, 60, 90]
+SIGMAS = [1.5, 2.0, 2.5, 3.0]
+
+
+def sweep_thresholds(df: pd.DataFrame,
+                     windows: list = WINDOWS,
+                     sigmas: list = SIGMAS):
+    '''
+    Число и доля аномалий для всех городов и всех пар (окно, множитель σ) за один проход по кумулятивным суммам.
+    Правило то же, что в analyze_city: |t - rolling_mean| > σ * rolling_std, неполные окна не считаются.
+    '''
+    df = df.sort_values(by=["city", "timestamp"], kind="stable")
+    codes, cities = pd.factorize(df["city"], sort=True)
+    temperature = df["temperature"].to_numpy(dtype=np.float64)
+
+    ### центрируем по городу: дисперсия от сдвига не зависит, а кумулятивные суммы остаются небольшими
+    counts = np.bincount(codes, minlength=len(cities))
+    city_mean = np.bincount(codes, weights=temperature, minlength=len(cities)) / counts
+    centered = temperature - city_mean[codes]
+
+    ### префиксные суммы с нулем в начале: сумма окна [i - w + 1, i] = cumsum[i + 1] - cumsum[i + 1 - w]
+    cumsum = np.concatenate(([0.0], np.cumsum(centered)))
+    cumsum_sq = np.concatenate(([0.0], np.cumsum(centered * centered)))
+    city_start = np.concatenate(([0], np.cumsum(counts)))[codes]
+    position = np.arange(len(temperature))
+    sigmas = np.asarray(sigmas, dtype=np.float64)
+
+    rows = []
+    for window in windows:
+        valid = position - city_start >= window - 1
+        end = position[valid] + 1
+        window_sum = cumsum[end] - cumsum[end - window]
+        window_sum_sq = cumsum_sq[end] - cumsum_sq[end - window]
+        mean = window_sum / window
+        std = np.sqrt(np.maximum(window_sum_sq - window_sum * mean, 0.0) / (window - 1))
+
+        deviation = np.abs(centered[valid] - mean)
+        ### все множители σ сразу: матрица (точки × σ)
+        is_anomaly = deviation[:, None] > std[:, None] * sigmas[None, :]
+        valid_codes = codes[valid]
+        for j, sigma in enumerate(sigmas):
+            anomalies = np.bincount(valid_codes, weights=is_anomaly[:, j], minlength=len(cities))
+            rows.append(pd.DataFrame({"city": cities,
+                                      "window": window,
+                                      "sigmas": sigma,
+                                      "anomalies": anomalies.astype(np.int64),
+                                      "points": counts}))
+
+    result = pd.concat(rows, ignore_index=True)
+    result["anomaly_rate"] = result["anomalies"] / result["points"]
+    return result
+
+
+def sweep_summary(sweep: pd.DataFrame):
+    '''
+    Доля аномалий по всем городам: строки - окна, колонки - множители σ.
+    '''
+    totals = sweep.groupby(["window", "sigmas"])[["anomalies", "points"]].sum()
+    return (totals["anomalies"] / totals["points"]).unstack("sigmas")
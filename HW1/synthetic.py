@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+from analysis import SEASONS, month_to_season
+
+# Реальные средние температуры (примерные данные) для городов по сезонам - модель из ноутбука
+seasonal_temperatures = {
+    "New York": {"winter": 0, "spring": 10, "summer": 25, "autumn": 15},
+    "London": {"winter": 5, "spring": 11, "summer": 18, "autumn": 12},
+    "Paris": {"winter": 4, "spring": 12, "summer": 20, "autumn": 13},
+    "Tokyo": {"winter": 6, "spring": 15, "summer": 27, "autumn": 18},
+    "Moscow": {"winter": -10, "spring": 5, "summer": 18, "autumn": 8},
+    "Sydney": {"winter": 12, "spring": 18, "summer": 25, "autumn": 20},
+    "Berlin": {"winter": 0, "spring": 10, "summer": 20, "autumn": 11},
+    "Beijing": {"winter": -2, "spring": 13, "summer": 27, "autumn": 16},
+    "Rio de Janeiro": {"winter": 20, "spring": 25, "summer": 30, "autumn": 25},
+    "Dubai": {"winter": 20, "spring": 30, "summer": 40, "autumn": 30},
+    "Los Angeles": {"winter": 15, "spring": 18, "summer": 25, "autumn": 20},
+    "Singapore": {"winter": 27, "spring": 28, "summer": 28, "autumn": 27},
+    "Mumbai": {"winter": 25, "spring": 30, "summer": 35, "autumn": 30},
+    "Cairo": {"winter": 15, "spring": 25, "summer": 35, "autumn": 25},
+    "Mexico City": {"winter": 12, "spring": 18, "summer": 20, "autumn": 15},
+}
+
+
+def synthetic_seasonal_temperatures(n_cities: int,
+                                    seed: int = 0):
+    '''
+    Первые 15 городов - из ноутбука, остальные - вымышленные с правдоподобными сезонными средними.
+    '''
+    rng = np.random.default_rng(seed)
+    profiles = dict(list(seasonal_temperatures.items())[:n_cities])
+    for i in range(len(profiles), n_cities):
+        winter = rng.uniform(-15, 25)
+        amplitude = rng.uniform(2, 25)  ### разница лета и зимы
+        profiles[f"City {i + 1}"] = {"winter": winter,
+                                     "spring": winter + amplitude / 2,
+                                     "summer": winter + amplitude,
+                                     "autumn": winter + amplitude / 2}
+    return profiles
+
+
+def generate_temperature_data(n_cities: int = 15,
+                              n_years: int = 10,
+                              seed: int = 0,
+                              scale: float = 5):
+    '''
+    Векторизованный аналог generate_realistic_temperature_data из ноутбука для N городов × M лет.
+    Одинаковый seed дает одинаковые данные.
+    '''
+    rng = np.random.default_rng(seed)
+    profiles = synthetic_seasonal_temperatures(n_cities, seed)
+    dates = pd.date_range(start="2010-01-01", periods=365 * n_years, freq="D")
+    seasons = dates.month.map(month_to_season).to_numpy()
+    season_codes = pd.Categorical(seasons, categories=SEASONS).codes
+
+    cities = list(profiles)
+    means = np.array([[profiles[city][season] for season in SEASONS] for city in cities])
+    mean_temperatures = means[:, season_codes].ravel()
+
+    return pd.DataFrame({
+        "city": np.repeat(cities, len(dates)),
+        "timestamp": np.tile(dates, len(cities)),
+        "temperature": rng.normal(loc=mean_temperatures, scale=scale),
+        "season": np.tile(seasons, len(cities)),
+    })
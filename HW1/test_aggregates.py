@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+from aggregates import aggregate_city
+from city_index import CityIndex
+from synthetic import generate_temperature_data
+
+
+@pytest.fixture(params=["str", "category"])
+def city_data(request):
+    df = generate_temperature_data(n_cities=2, n_years=3, seed=2)
+    for column in ["city", "season"]:
+        df[column] = df[column].astype(request.param)
+    ### период внутри ряда одного города, как после выбора дат в приложении
+    return CityIndex(df).slice(df["city"].iloc[0], "2010-03-15", "2012-02-10")
+
+
+def test_describe_matches_pandas(city_data):
+    aggregates = aggregate_city(city_data)
+    numeric = aggregates["describe"]
+    expected = city_data.describe()
+
+    assert list(numeric.index) == list(expected.index)
+    np.testing.assert_allclose(numeric["temperature"].to_numpy(dtype=np.float64),
+                               expected["temperature"].to_numpy(dtype=np.float64), rtol=1e-12)
+    ### даты в таблице строками, std для дат не определен
+    expected_timestamps = expected["timestamp"].drop("std")
+    assert numeric.at["count", "timestamp"] == str(int(expected_timestamps["count"]))
+    assert (pd.to_datetime(numeric["timestamp"].drop(["count", "std"])).to_numpy()
+            == pd.to_datetime(expected_timestamps.drop("count")).to_numpy()).all()
+    assert pd.isna(pd.to_datetime(numeric.at["std", "timestamp"]))
+
+
+def test_describe_object_matches_pandas(city_data):
+    categorical = aggregate_city(city_data)["describe_object"]
+    expected = city_data[["city", "season"]].describe()
+    pd.testing.assert_frame_equal(categorical, expected.astype(str), check_dtype=False)
+
+
+def test_histogram_and_boxes_match_numpy(city_data):
+    aggregates = aggregate_city(city_data, nbins=20)
+    temperature = city_data["temperature"].to_numpy()
+
+    counts, edges = np.histogram(temperature, bins=20)
+    np.testing.assert_array_equal(aggregates["histogram"]["edges"], edges)
+    np.testing.assert_allclose(aggregates["histogram"]["probability"], counts / len(temperature))
+    assert aggregates["histogram"]["probability"].sum() == pytest.approx(1)
+
+    for season, box in aggregates["boxes"].items():
+        values = city_data.loc[city_data["season"] == season, "temperature"]
+        assert [box["q1"], box["median"], box["q3"]] == pytest.approx(list(values.quantile([0.25, 0.5, 0.75])))
+        assert box["mean"] == pytest.approx(values.mean())
+        ### все точки либо внутри усов, либо в выбросах
+        inside = values[(values >= box["lowerfence"]) & (values <= box["upperfence"])]
+        assert len(inside) + len(box["outliers"]) == len(values)
@@ -0,0 +1,21 @@
+import pandas as pd
+import pytest
+from analysis import analyze_all_cities, analyze_city
+from synthetic import generate_temperature_data
+
+
+@pytest.mark.parametrize("window, sigmas", [(30, 2), (7, 1.5)])
+def test_analyze_all_cities_matches_analyze_city(window, sigmas):
+    df = generate_temperature_data(n_cities=4, n_years=3, seed=1)
+
+    expected = {city: analyze_city(df[df["city"] == city].copy(), window=window, sigmas=sigmas)
+                for city in df["city"].unique()}
+    actual = analyze_all_cities(df, window=window, sigmas=sigmas)
+
+    assert expected.keys() == actual.keys()
+    for city, result in expected.items():
+        for key in ("avg_temp", "min_temp", "max_temp", "trend_per_decade"):
+            assert result[key] == pytest.approx(actual[city][key], abs=1e-9), (city, key)
+        assert result["trend"] == actual[city]["trend"], city
+        pd.testing.assert_frame_equal(result["seasonal_profile"], actual[city]["seasonal_profile"])
+        pd.testing.assert_frame_equal(result["anomalies"], actual[city]["anomalies"])
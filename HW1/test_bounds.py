@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analysis import SEASONS, analyze_all_cities, anomality_check
+from bounds import SeasonalBounds
+from synthetic import generate_temperature_data
+
+
+@pytest.fixture(scope="module")
+def df():
+    return generate_temperature_data(n_cities=4, n_years=2, seed=3)
+
+
+@pytest.fixture(scope="module")
+def profiles(df):
+    return {city: result["seasonal_profile"] for city, result in analyze_all_cities(df).items()}
+
+
+def candidate_temps(profile: pd.DataFrame,
+                    season: str,
+                    sigmas: float):
+    ### точки внутри, снаружи и ровно на границах нормы
+    row = profile[profile["season"] == season].iloc[0]
+    mean, std = row["season_avg_temp"], row["season_std_temp"]
+    return np.r_[np.linspace(mean - 4 * std, mean + 4 * std, 41), mean - sigmas * std, mean + sigmas * std]
+
+
+@pytest.mark.parametrize("sigmas", [1.5, 2, 3])
+@pytest.mark.parametrize("build", ["reload", "from_profiles"])
+def test_check_many_matches_anomality_check(df, profiles, sigmas, build):
+    if build == "reload":
+        bounds = SeasonalBounds(df, sigmas=sigmas)
+    else:
+        bounds = SeasonalBounds.from_profiles(profiles, sigmas=sigmas)
+
+    for city, profile in profiles.items():
+        for season in SEASONS:
+            temps = candidate_temps(profile, season, sigmas)
+            expected = [anomality_check(temp, profile, season, sigmas=sigmas) for temp in temps]
+            actual = bounds.check_many([city] * len(temps), temps, season)
+            np.testing.assert_array_equal(actual, expected, err_msg=f"{city}, {season}")
+
+
+def test_check_many_with_season_per_city(df, profiles):
+    bounds = SeasonalBounds(df)
+    cities = list(profiles) * len(SEASONS)
+    seasons = np.repeat(SEASONS, len(profiles))
+    temps = np.linspace(-30, 40, len(cities))
+    expected = [anomality_check(temp, profiles[city], season) for city, season, temp in zip(cities, seasons, temps)]
+    np.testing.assert_array_equal(bounds.check_many(cities, temps, seasons), expected)
+
+
+def test_season_without_history_is_normal(df):
+    city = df["city"].iloc[0]
+    bounds = SeasonalBounds(df[(df["city"] != city) | (df["season"] != "summer")])
+    assert not bounds.check_many([city], [1000.0], "summer")[0]
+    assert bounds.check_many([city], [1000.0], "winter")[0]
+
+
+def test_unknown_city_and_season_raise(df):
+    bounds = SeasonalBounds(df)
+    with pytest.raises(KeyError):
+        bounds.check_many(["Atlantis"], [10.0], "winter")
+    with pytest.raises(KeyError):
+        bounds.check_many([df["city"].iloc[0]], [10.0], "monsoon")
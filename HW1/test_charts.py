@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from charts import time_series_figure
+
+
+def make_city_data(n: int):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({"timestamp": pd.date_range("2000-01-01", periods=n, freq="D"),
+                         "temperature": rng.normal(10, 5, n)})
+
+
+def test_payload_after_matches_serialized_figure():
+    city_data = make_city_data(20_000)
+    anomalies = city_data.iloc[::997]
+    fig, stats = time_series_figure(city_data, anomalies)
+
+    assert stats["bytes_after"] == len(fig.to_json().encode())
+    assert stats["points_after"] < stats["points_before"]
+    ### аномалии не теряются при прореживании
+    assert set(anomalies["timestamp"]) <= set(pd.to_datetime(fig.data[0].x))
+
+
+def test_payload_before_estimate_is_close_to_full_figure():
+    city_data = make_city_data(20_000)
+    anomalies = city_data.iloc[::997]
+    fig, stats = time_series_figure(city_data, anomalies)
+
+    full_fig = go.Figure(fig)
+    full_fig.data[0].x, full_fig.data[0].y = city_data["timestamp"], city_data["temperature"]
+    actual = len(full_fig.to_json().encode())
+    assert abs(stats["bytes_before"] - actual) / actual < 0.05
+
+
+def test_small_series_is_not_downsampled():
+    city_data = make_city_data(500)
+    fig, stats = time_series_figure(city_data, city_data.iloc[:0])
+    assert stats["points_before"] == stats["points_after"] == 500
+    assert stats["bytes_before"] == stats["bytes_after"]
+    assert not stats["webgl"]
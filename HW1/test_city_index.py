@@ -0,0 +1,45 @@
+import datetime
+import pandas as pd
+import pytest
+from city_index import CityIndex
+from synthetic import generate_temperature_data
+
+
+def boolean_mask_slice(df: pd.DataFrame,
+                       city: str,
+                       start_date,
+                       end_date):
+    ### так выборка делалась в app.py до индекса
+    return df[(df["city"] == city) & (df["timestamp"].between(pd.Timestamp(start_date), pd.Timestamp(end_date)))]
+
+
+@pytest.fixture(params=["str", "category"])
+def df(request):
+    df = generate_temperature_data(n_cities=3, n_years=2, seed=5)
+    df["city"] = df["city"].astype(request.param)
+    ### исходный файл не обязан быть отсортирован
+    return df.sample(frac=1, random_state=0)
+
+
+@pytest.mark.parametrize("start_date, end_date", [
+    ("2000-01-01", "2100-01-01"),  ### шире всего ряда
+    ("2011-02-15", "2011-08-31"),
+    ("2011-03-01", "2011-03-01"),  ### один день, границы включаются
+    ("2011-05-01", "2011-04-01"),  ### пустой период
+    (datetime.date(2010, 12, 31), datetime.date(2011, 1, 2)),  ### так даты приходят из st.date_input
+])
+def test_slice_matches_boolean_mask(df, start_date, end_date):
+    index = CityIndex(df)
+    for city in df["city"].unique():
+        expected = boolean_mask_slice(df, city, start_date, end_date).sort_values("timestamp")
+        actual = index.slice(city, start_date, end_date)
+        pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_cities_and_date_bounds(df):
+    index = CityIndex(df)
+    assert index.cities == list(pd.unique(df["city"]))
+    for city in index.cities:
+        city_df = df[df["city"] == city]
+        assert index.date_bounds(city) == (city_df["timestamp"].min(), city_df["timestamp"].max())
+        pd.testing.assert_frame_equal(index.city_frame(city), city_df.sort_values("timestamp"))
@@ -0,0 +1,19 @@
+from analysis import analyze_all_cities
+from compact import EPOCH, RollingAnomalies, TemperatureData
+from synthetic import generate_temperature_data
+
+
+def test_rolling_anomalies_match_analyze_all_cities():
+    df = generate_temperature_data(n_cities=5, n_years=5, seed=2)
+    expected = analyze_all_cities(df)
+
+    data = TemperatureData.from_frame(df)
+    derived = RollingAnomalies(data).compute(data)
+
+    assert set(data.ranges) == set(expected)
+    for city, (start, stop) in data.ranges.items():
+        flagged = derived.is_anomaly[start:stop]
+        anomalies = expected[city]["anomalies"]
+        assert flagged.sum() == len(anomalies)
+        flagged_dates = EPOCH + data.days[start:stop][flagged]
+        assert list(flagged_dates) == list(anomalies["timestamp"].to_numpy(dtype="datetime64[D]"))
@@ -0,0 +1,74 @@
+import os
+import pandas as pd
+import pytest
+import data_cache
+from data_cache import content_hash, load_temperature_data, parse_temperature_csv
+from synthetic import generate_temperature_data
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    ### у каждого теста свой каталог и пустой кэш в памяти
+    monkeypatch.setattr(data_cache, "CACHE_DIR", tmp_path / "uploads")
+    monkeypatch.setattr(data_cache, "_memory_cache", data_cache.OrderedDict())
+    data_cache.stats.clear()
+    return tmp_path / "uploads"
+
+
+def make_csv(seed: int = 0,
+             n_cities: int = 2):
+    return generate_temperature_data(n_cities=n_cities, n_years=1, seed=seed).to_csv(index=False).encode()
+
+
+def test_parquet_round_trip_keeps_values_and_dtypes(cache_dir):
+    data = make_csv()
+    parsed = load_temperature_data(data)
+
+    ### перезапуск процесса: память пуста, данные читаются из parquet
+    data_cache._memory_cache.clear()
+    restored = load_temperature_data(data)
+
+    assert data_cache.stats == {"miss": 1, "disk_hit": 1}
+    assert restored is not parsed
+    pd.testing.assert_frame_equal(restored, parsed)
+    pd.testing.assert_frame_equal(restored, parse_temperature_csv(data))
+    assert isinstance(restored["city"].dtype, pd.CategoricalDtype)
+    assert isinstance(restored["season"].dtype, pd.CategoricalDtype)
+    assert pd.api.types.is_datetime64_any_dtype(restored["timestamp"])
+
+
+def test_memory_hit_returns_the_same_frame(cache_dir):
+    data = make_csv()
+    first = load_temperature_data(data, content_hash(data))
+    second = load_temperature_data(data)
+    assert second is first
+    assert data_cache.stats == {"miss": 1, "memory_hit": 1}
+
+
+def test_changed_content_is_not_served_from_cache(cache_dir):
+    old = make_csv(seed=0)
+    new = make_csv(seed=1)
+    load_temperature_data(old)
+    df = load_temperature_data(new)
+
+    assert data_cache.stats == {"miss": 2}
+    pd.testing.assert_frame_equal(df, parse_temperature_csv(new))
+    assert {path.stem for path in cache_dir.glob("*.parquet")} == {content_hash(old), content_hash(new)}
+
+
+def test_disk_cache_evicts_least_recently_used(cache_dir, monkeypatch):
+    datasets = [make_csv(seed=seed) for seed in range(3)]
+    load_temperature_data(datasets[0])
+    size = (cache_dir / f"{content_hash(datasets[0])}.parquet").stat().st_size
+    ### в лимит помещаются два файла из трех
+    monkeypatch.setattr(data_cache, "DISK_CACHE_BYTES", int(size * 2.5))
+
+    load_temperature_data(datasets[1])
+    paths = [cache_dir / f"{content_hash(data)}.parquet" for data in datasets]
+    ### первый датасет читали последним - вытеснен должен быть второй
+    os.utime(paths[0], (2_000_000_000, 2_000_000_000))
+    os.utime(paths[1], (1_000_000_000, 1_000_000_000))
+    load_temperature_data(datasets[2])
+
+    assert [path.exists() for path in paths] == [True, False, True]
+    assert not list(cache_dir.glob("*.tmp"))
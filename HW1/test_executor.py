@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analysis import SEASONS
+from executor import analyze_cities, choose_backend
+from synthetic import generate_temperature_data
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+@pytest.mark.parametrize("season_dtype", ["str", pd.CategoricalDtype(SEASONS)])
+def test_pool_backends_match_sequential_for_non_alphabetical_categories(backend, season_dtype):
+    df = generate_temperature_data(n_cities=3, n_years=2, seed=7)
+    ### категории не по алфавиту, как бывает при чтении Parquet
+    categories = list(df["city"].unique())[::-1]
+    assert categories != sorted(categories)
+    df["city"] = pd.Categorical(df["city"], categories=categories)
+    df["season"] = df["season"].astype(season_dtype)
+
+    sequential = analyze_cities(df, backend="sequential")
+    ### 2 рабочих на 3 города - в одной группе несколько городов
+    pooled = analyze_cities(df, backend=backend, max_workers=2)
+
+    assert set(pooled) == set(sequential)
+    for city, expected in sequential.items():
+        result = pooled[city]
+        assert np.isclose(result["avg_temp"], expected["avg_temp"])
+        assert result["min_temp"] == expected["min_temp"]
+        assert result["max_temp"] == expected["max_temp"]
+        assert result["trend"] == expected["trend"]
+        ### сравниваем и значения, и типы колонок: категории не должны превращаться в строки
+        pd.testing.assert_frame_equal(result["seasonal_profile"], expected["seasonal_profile"])
+        pd.testing.assert_frame_equal(result["anomalies"], expected["anomalies"])
+
+
+def test_auto_runs_small_data_in_process():
+    assert choose_backend(n_rows=54_750, n_cities=15, cpu_count=8) == "sequential"
+    assert choose_backend(n_rows=5_000_000, n_cities=15, cpu_count=8) == "process"
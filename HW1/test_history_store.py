@@ -0,0 +1,16 @@
+import pandas as pd
+from analysis import analyze_city
+from data_cache import parse_temperature_csv
+from history_store import HistoryStore
+from synthetic import generate_temperature_data
+
+
+def test_store_and_csv_paths_give_the_same_seasonal_profile(tmp_path):
+    csv_bytes = generate_temperature_data(n_cities=2, n_years=2, seed=1).to_csv(index=False).encode()
+    df = parse_temperature_csv(csv_bytes)
+    store = HistoryStore.from_frame(tmp_path / "history.bin", df)
+
+    for city in store.cities:
+        expected = analyze_city(df[df["city"] == city].copy())
+        result = analyze_city(store.city_frame(city))
+        pd.testing.assert_frame_equal(result["seasonal_profile"], expected["seasonal_profile"])
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+from analysis import analyze_city
+from online import OnlineAnomalyDetector
+from synthetic import generate_temperature_data
+
+
+def test_online_detector_matches_analyze_city_across_checkpoint(tmp_path):
+    df = generate_temperature_data(n_cities=1, n_years=3, seed=5)
+    expected = analyze_city(df.copy())
+
+    detector = OnlineAnomalyDetector()
+    flags = []
+    half = len(df) // 2
+    for i, row in enumerate(df.itertuples(index=False)):
+        if i == half:
+            ### чекпоинт посередине ряда: дальше работает восстановленный детектор
+            detector.save(tmp_path / "detector.json")
+            detector = OnlineAnomalyDetector.load(tmp_path / "detector.json")
+        flags.append(detector.update(row.timestamp, row.temperature, row.season))
+
+    assert list(df.index[flags]) == list(expected["anomalies"].index)
+
+    summary = detector.summary()
+    assert np.isclose(summary["avg_temp"], expected["avg_temp"])
+    assert summary["min_temp"] == expected["min_temp"]
+    assert summary["max_temp"] == expected["max_temp"]
+    assert summary["trend"] == expected["trend"]
+    assert np.isclose(summary["trend_per_decade"], expected["trend_per_decade"])
+    pd.testing.assert_frame_equal(summary["seasonal_profile"], expected["seasonal_profile"])
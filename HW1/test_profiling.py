@@ -0,0 +1,59 @@
+import threading
+from profiling import CacheStats, StageProfiler, mark_cache_miss
+
+
+def run_session(stats: CacheStats,
+                events: list,
+                log_path):
+    profiler = StageProfiler(enabled=True, log_path=log_path)
+    for event in events:
+        stats[event] += 1
+    return profiler.write()
+
+
+def test_sessions_see_only_their_own_cache_events(tmp_path):
+    stats = CacheStats("uploads")
+    reports = {}
+
+    def session(name, events):
+        reports[name] = run_session(stats, events, tmp_path / "profile.jsonl")
+
+    threads = [threading.Thread(target=session, args=("a", ["memory_hit"] * 3)),
+               threading.Thread(target=session, args=("b", ["miss", "disk_hit"]))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert reports["a"]["caches"] == {"uploads": {"memory_hit": 3}}
+    assert reports["b"]["caches"] == {"uploads": {"miss": 1, "disk_hit": 1}}
+    ### общий счетчик процесса по-прежнему видит все обращения
+    assert stats == {"memory_hit": 3, "miss": 1, "disk_hit": 1}
+
+
+def test_streamlit_cache_hits_and_misses(tmp_path):
+    memo = {}
+
+    def cached_square(value):
+        ### так ведет себя функция под st.cache_data: тело выполняется только при промахе
+        if value not in memo:
+            mark_cache_miss("square")
+            memo[value] = value ** 2
+        return memo[value]
+
+    profiler = StageProfiler(enabled=True, log_path=tmp_path / "profile.jsonl")
+    results = [profiler.cached("square", cached_square, value) for value in [2, 2, 3, 2]]
+    report = profiler.write()
+
+    assert results == [4, 4, 9, 4]
+    assert report["caches"] == {"square": {"miss": 2, "hit": 2}}
+
+
+def test_disabled_profiler_counts_nothing(tmp_path):
+    stats = CacheStats("geocode")
+    profiler = StageProfiler(enabled=False, log_path=tmp_path / "profile.jsonl")
+    stats["miss"] += 1
+    assert profiler.cached("square", lambda: 1) == 1
+    assert profiler.write() is None
+    assert not (tmp_path / "profile.jsonl").exists()
+    assert stats["miss"] == 1
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+from robust import SORTED_WINDOW_MIN, _rolling_mad_sorted, _rolling_mad_vectorized, robust_anomalies
+
+
+def test_sorted_and_vectorized_mad_agree():
+    values = np.random.default_rng(0).normal(10, 5, size=1000).round(1)  ### с повторами, как в реальных данных
+    median = pd.Series(values).rolling(window=SORTED_WINDOW_MIN).median().to_numpy()
+    np.testing.assert_allclose(_rolling_mad_sorted(values, median, SORTED_WINDOW_MIN),
+                               _rolling_mad_vectorized(values, median, SORTED_WINDOW_MIN))
+
+
+def test_flat_window_gives_no_anomalies_for_small_steps():
+    df = pd.DataFrame({"city": "Flat", "temperature": [20.0] * 40 + [20.5, 20.0, 19.5]})
+    assert not robust_anomalies(df, window=30, sigmas=2)["is_anomaly"].any()
+
+
+def test_spike_is_flagged_on_rounded_data():
+    ### целые градусы с маленьким разбросом: в большинстве окон MAD == 0
+    temperature = np.random.default_rng(1).normal(27.6, 0.4, size=400).round()
+    temperature[150] = 40.0
+    df = pd.DataFrame({"city": "Singapore", "temperature": temperature})
+
+    result = robust_anomalies(df, window=30, sigmas=2)
+    assert result["is_anomaly"].iloc[150]
+    assert result["is_anomaly"].sum() < 10
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+from analysis import analyze_all_cities
+from streaming import stream_analyze_cities
+from synthetic import generate_temperature_data
+
+
+def test_stream_analyze_cities_matches_analyze_all_cities(tmp_path):
+    path = tmp_path / "temperature_data.csv"
+    generate_temperature_data(n_cities=4, n_years=3, seed=3).to_csv(path, index=False)
+    df = pd.read_csv(path, parse_dates=["timestamp"])
+
+    expected = analyze_all_cities(df)
+    ### маленькие чанки, чтобы города и сезоны разрезались между чанками
+    streamed = stream_analyze_cities(path, chunksize=1000)
+
+    assert set(streamed) == set(expected)
+    for city, result in expected.items():
+        actual = streamed[city]
+        assert actual["count"] == (df["city"] == city).sum()
+        assert np.isclose(actual["avg_temp"], result["avg_temp"])
+        assert actual["min_temp"] == result["min_temp"]
+        assert actual["max_temp"] == result["max_temp"]
+        assert actual["trend"] == result["trend"]
+        assert np.isclose(actual["trend_per_decade"], result["trend_per_decade"])
+        pd.testing.assert_frame_equal(actual["seasonal_profile"], result["seasonal_profile"])
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from trend import DAYS_PER_DECADE, _t_quantile, batch_trends, ols_by_group, trend_slope
+from synthetic import generate_temperature_data
+
+
+def reference_ols(x: np.ndarray,
+                  y: np.ndarray):
+    '''
+    Независимая сверка: np.polyfit с ковариацией коэффициентов и точный квантиль Стьюдента из scipy.
+    '''
+    stats = pytest.importorskip("scipy.stats")
+    (slope, intercept), cov = np.polyfit(x, y, 1, cov=True)
+    margin = stats.t.ppf(0.975, len(x) - 2) * np.sqrt(cov[0, 0])
+    r2 = np.corrcoef(x, y)[0, 1] ** 2
+    return slope, intercept, r2, slope - margin, slope + margin
+
+
+@pytest.mark.parametrize("n", [10, 60, 3650])
+def test_ols_by_group_matches_polyfit(n):
+    rng = np.random.default_rng(n)
+    codes = np.repeat(np.arange(3), n)
+    x = np.tile(np.arange(n, dtype=np.float64), 3)
+    y = 0.01 * codes * x + rng.normal(0, 3, 3 * n)
+
+    result = ols_by_group(codes, x, y, 3)
+    for group in range(3):
+        mask = codes == group
+        slope, intercept, r2, ci_low, ci_high = reference_ols(x[mask], y[mask])
+        assert result["n"][group] == n
+        assert result["slope"][group] == pytest.approx(slope, rel=1e-9, abs=1e-12)
+        assert result["intercept"][group] == pytest.approx(intercept, rel=1e-9, abs=1e-12)
+        assert result["r2"][group] == pytest.approx(r2, rel=1e-9, abs=1e-12)
+        ### квантиль через Корниша-Фишера: на коротких рядах интервал чуть уже/шире точного
+        half_width = (ci_high - ci_low) / 2
+        assert result["ci_low"][group] == pytest.approx(ci_low, abs=0.01 * half_width)
+        assert result["ci_high"][group] == pytest.approx(ci_high, abs=0.01 * half_width)
+
+
+def test_t_quantile_is_within_one_percent_of_exact():
+    stats = pytest.importorskip("scipy.stats")
+    dof = np.array([5, 8, 30, 365, 3650])
+    np.testing.assert_allclose(_t_quantile(dof), stats.t.ppf(0.975, dof), rtol=0.01)
+
+
+def test_batch_trends_match_per_group_fit():
+    df = generate_temperature_data(n_cities=3, n_years=2, seed=4)
+    trends = batch_trends(df, by=("city", "season"))
+
+    for (city, season), group in df.groupby(["city", "season"], observed=True):
+        days = (group["timestamp"] - group["timestamp"].min()).dt.days.to_numpy()
+        slope, intercept, r2, ci_low, ci_high = reference_ols(days, group["temperature"].to_numpy())
+        row = trends.loc[(city, season)]
+        assert row["n"] == len(group)
+        assert row["slope_per_decade"] == pytest.approx(slope * DAYS_PER_DECADE, rel=1e-9, abs=1e-9)
+        assert row["r2"] == pytest.approx(r2, rel=1e-9, abs=1e-12)
+        half_width = (ci_high - ci_low) / 2 * DAYS_PER_DECADE
+        assert row["ci_low_per_decade"] == pytest.approx(ci_low * DAYS_PER_DECADE, abs=0.01 * half_width)
+        assert row["ci_high_per_decade"] == pytest.approx(ci_high * DAYS_PER_DECADE, abs=0.01 * half_width)
+        assert row["trend"] == ("positive" if slope > 0 else "negative")
+
+
+def test_trend_slope_of_single_series():
+    days = pd.Series(np.arange(100))
+    assert trend_slope(days, 5 + 0.25 * days) == pytest.approx(0.25)
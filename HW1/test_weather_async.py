@@ -0,0 +1,93 @@
+import asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from weather_async import fetch_current_temperatures
+
+CITIES = [f"City {i}" for i in range(12)]
+
+
+class StubOpenWeatherMap:
+    '''
+    Локальная заглушка геокодинга и текущей погоды OpenWeatherMap.
+    '''
+
+    def __init__(self,
+                 delay: float = 0.05,
+                 failures: dict = None,
+                 unknown: set = (),
+                 hang: set = ()):
+        self.delay = delay
+        self.failures = dict(failures or {})  ### город -> сколько раз ответить 503
+        self.unknown = set(unknown)
+        self.hang = set(hang)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = {}
+
+    async def geo(self,
+                  request: web.Request):
+        city = request.query["q"]
+        if city in self.unknown:
+            return web.json_response([])
+        return web.json_response([{"lat": float(CITIES.index(city)), "lon": 0.0}])
+
+    async def weather(self,
+                      request: web.Request):
+        city = CITIES[int(float(request.query["lat"]))]
+        self.requests[city] = self.requests.get(city, 0) + 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(10 if city in self.hang else self.delay)
+        finally:
+            self.in_flight -= 1
+        if self.failures.get(city, 0) > 0:
+            self.failures[city] -= 1
+            return web.Response(status=503, text="busy")
+        return web.json_response({"main": {"temp": float(CITIES.index(city))}})
+
+    async def fetch(self,
+                    cities: list,
+                    **kwargs):
+        app = web.Application()
+        app.router.add_get("/geo", self.geo)
+        app.router.add_get("/weather", self.weather)
+        async with TestServer(app) as server:
+            return await fetch_current_temperatures(cities, "key",
+                                                    lat_lon_url=str(server.make_url("/geo")),
+                                                    temp_url=str(server.make_url("/weather")),
+                                                    **kwargs)
+
+
+def test_fetches_all_cities_with_bounded_concurrency():
+    stub = StubOpenWeatherMap()
+    temperatures, errors = asyncio.run(stub.fetch(CITIES, max_concurrency=4))
+
+    assert errors == {}
+    assert temperatures == {city: float(i) for i, city in enumerate(CITIES)}
+    assert stub.max_in_flight == 4
+
+
+def test_retries_on_503():
+    stub = StubOpenWeatherMap(failures={"City 3": 1})
+    temperatures, errors = asyncio.run(stub.fetch(CITIES[:5]))
+
+    assert errors == {}
+    assert temperatures["City 3"] == 3.0
+    assert stub.requests["City 3"] == 2
+
+
+def test_unknown_city_is_reported_as_error():
+    stub = StubOpenWeatherMap(unknown={"City 1"})
+    temperatures, errors = asyncio.run(stub.fetch(CITIES[:3]))
+
+    assert set(temperatures) == {"City 0", "City 2"}
+    assert "City not found: City 1" in errors["City 1"]
+
+
+def test_timeout_is_reported_as_error_without_blocking_other_cities():
+    stub = StubOpenWeatherMap(hang={"City 2"})
+    temperatures, errors = asyncio.run(stub.fetch(CITIES[:3], timeout=0.2))
+
+    assert set(temperatures) == {"City 0", "City 1"}
+    assert "TimeoutError" in errors["City 2"]
@@ -0,0 +1,72 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from weather_cache import TTLCache, coordinates_key
+
+
+class Upstream:
+    '''
+    Подмена запроса к OpenWeatherMap: считает вызовы и отдает значения по очереди.
+    '''
+
+    def __init__(self,
+                 values: list,
+                 delay: float = 0):
+        self.values = list(values)
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls += 1
+            value = self.values.pop(0)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+def test_concurrent_misses_share_one_request():
+    cache = TTLCache(ttl=60)
+    upstream = Upstream([21.5], delay=0.1)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: cache.get("Moscow", upstream), range(8)))
+
+    assert results == [21.5] * 8
+    assert upstream.calls == 1
+    assert cache.stats["miss"] == 1
+    assert cache.stats["coalesced"] == 7
+
+
+def test_stale_value_is_served_while_refreshing_in_background():
+    cache = TTLCache(ttl=0.2, max_stale=10)
+    upstream = Upstream([21.5, 23.0], delay=0.05)
+    assert cache.get("Moscow", upstream) == 21.5
+    time.sleep(0.3)
+
+    start_time = time.perf_counter()
+    assert cache.get("Moscow", upstream) == 21.5  ### устаревшее значение сразу, без ожидания API
+    assert time.perf_counter() - start_time < upstream.delay
+    time.sleep(0.1)
+    assert cache.get("Moscow", upstream) == 23.0
+    assert upstream.calls == 2
+    assert cache.stats["stale"] == 1
+
+
+def test_value_older_than_max_stale_is_not_served():
+    cache = TTLCache(ttl=0.05, max_stale=0.1)
+    upstream = Upstream([21.5, RuntimeError("401 Unauthorized"), 23.0])
+    assert cache.get("Moscow", upstream) == 21.5
+    time.sleep(0.2)
+
+    with pytest.raises(RuntimeError):
+        cache.get("Moscow", upstream)
+    assert cache.get("Moscow", upstream) == 23.0
+    assert cache.stats["expired"] == 2
+
+
+def test_cache_key_depends_on_api_key():
+    assert coordinates_key(55.75583, 37.61730, "good") == coordinates_key(55.755826, 37.617300, "good")
+    assert coordinates_key(55.75583, 37.61730, "good") != coordinates_key(55.75583, 37.61730, "bad")
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+DAYS_PER_DECADE = 3652.5
+Z_95 = 1.959963984540054  ### квантиль нормального распределения для 95% интервала
+
+
+def _t_quantile(dof: np.ndarray,
+                z: float = Z_95):
+    '''
+    Квантиль распределения Стьюдента через разложение Корниша-Фишера (без scipy).
+    Для dof >= 5 ошибка меньше 1%, на наших рядах (сотни и тысячи дней) совпадает с точной.
+    '''
+    dof = np.asarray(dof, dtype=np.float64)
+    return (z
+            + (z ** 3 + z) / (4 * dof)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * dof ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * dof ** 3))
+
+
+def ols_by_group(codes: np.ndarray,
+                 x: np.ndarray,
+                 y: np.ndarray,
+                 n_groups: int):
+    '''
+    МНК y = a + b*x сразу для всех групп: суммы по группам через np.bincount, без цикла по группам.
+    Возвращаем словарь массивов длины n_groups.
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    n = np.bincount(codes, minlength=n_groups).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x = np.bincount(codes, weights=x, minlength=n_groups) / n
+        mean_y = np.bincount(codes, weights=y, minlength=n_groups) / n
+
+        ### центрируем внутри групп, чтобы не терять точность на больших x
+        dx = x - mean_x[codes]
+        dy = y - mean_y[codes]
+        sxx = np.bincount(codes, weights=dx * dx, minlength=n_groups)
+        syy = np.bincount(codes, weights=dy * dy, minlength=n_groups)
+        sxy = np.bincount(codes, weights=dx * dy, minlength=n_groups)
+
+        slope = sxy / sxx
+        intercept = mean_y - slope * mean_x
+        r2 = sxy * sxy / (sxx * syy)
+        residual = np.maximum(syy - slope * sxy, 0.0)
+        slope_se = np.sqrt(residual / (n - 2) / sxx)
+        margin = _t_quantile(n - 2) * slope_se
+
+    return {
+        "n": n.astype(np.int64),
+        "slope": slope,
+        "intercept": intercept,
+        "r2": r2,
+        "ci_low": slope - margin,
+        "ci_high": slope + margin,
+    }
+
+
+def trend_slope(days,
+                temperature):
+    '''
+    Наклон тренда одного ряда (°C в день).
+    '''
+    days = np.asarray(days)
+    return ols_by_group(np.zeros(len(days), dtype=np.intp), days, temperature, 1)["slope"][0]
+
+
+def batch_trends(df: pd.DataFrame,
+                 by=("city",)):
+    '''
+    Тренды по каждому городу (by=("city",)) или по каждой паре город×сезон (by=("city", "season")).
+    x - дни от первого наблюдения группы, наклон и доверительный интервал - в °C за десятилетие.
+    '''
+    by = list(by)
+    grouped = df.groupby(by, sort=True, observed=True)
+    codes = grouped.ngroup().to_numpy()
+    days = (df["timestamp"] - grouped["timestamp"].transform("min")).dt.days.to_numpy()
+
+    result = ols_by_group(codes, days, df["temperature"].to_numpy(), grouped.ngroups)
+    trends = pd.DataFrame({
+        "n": result["n"],
+        "slope_per_decade": result["slope"] * DAYS_PER_DECADE,
+        "ci_low_per_decade": result["ci_low"] * DAYS_PER_DECADE,
+        "ci_high_per_decade": result["ci_high"] * DAYS_PER_DECADE,
+        "intercept": result["intercept"],
+        "r2": result["r2"],
+    }, index=grouped.size().index)
+    trends["trend"] = np.where(trends["slope_per_decade"] > 0, "positive", "negative")
+    return trends
@@ -0,0 +1,125 @@
+import asyncio
+import aiohttp
+import pandas as pd
+from analysis import SEASONS
+from bounds import SeasonalBounds
+
+LAT_LON_URL = 'http://api.openweathermap.org/geo/1.0/direct'
+TEMP_URL = "https://api.openweathermap.org/data/2.5/weather"
+
+MAX_CONCURRENCY = 10  ### одновременных запросов к API
+REQUEST_TIMEOUT = 10  ### секунд на один запрос
+RETRIES = 3
+BACKOFF = 0.5  ### базовая задержка между повторами, удваивается на каждой попытке
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+    pass
+
+
+async def _get_json(session: aiohttp.ClientSession,
+                    semaphore: asyncio.Semaphore,
+                    url: str,
+                    params: dict,
+                    retries: int = RETRIES,
+                    backoff: float = BACKOFF):
+    '''
+    GET с ограничением параллельности и повторами с экспоненциальной задержкой.
+    '''
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                async with session.get(url, params=params) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    error = FetchError(f"Error fetching {url}: {response.status}, {await response.text()}")
+                    if response.status not in RETRY_STATUSES:
+                        raise error
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = FetchError(f"Error fetching {url}: {e!r}")
+        if attempt < retries:
+            await asyncio.sleep(backoff * 2 ** attempt)
+    raise error
+
+
+async def async_get_city_lat_lon(city: str,
+                                 session: aiohttp.ClientSession,
+                                 semaphore: asyncio.Semaphore,
+                                 api_key: str,
+                                 lat_lon_url: str = LAT_LON_URL):
+    '''
+    Асинхронно получаем широту и долготу города по его названию
+    '''
+    result = await _get_json(session, semaphore, lat_lon_url, {"q": city, "appid": api_key})
+    if not result:
+        raise FetchError(f"City not found: {city}")
+    return result[0]["lat"], result[0]["lon"]
+
+
+async def async_get_city_current_temperature(city: str,
+                                             session: aiohttp.ClientSession,
+                                             semaphore: asyncio.Semaphore,
+                                             api_key: str,
+                                             lat_lon_url: str = LAT_LON_URL,
+                                             temp_url: str = TEMP_URL,
+                                             geocache=None):
+    '''
+    Асинхронно получаем координаты города (из кэша, если он передан), затем его текущую температуру
+    '''
+    coordinates = geocache.get(city) if geocache is not None else None
+    if coordinates is None:
+        coordinates = await async_get_city_lat_lon(city, session, semaphore, api_key, lat_lon_url)
+        if geocache is not None:
+            geocache.put(city, *coordinates)
+    params = {
+        "lat": coordinates[0],
+        "lon": coordinates[1],
+        "appid": api_key,
+        "units": "metric"  ### переводим в градусы Цельсия
+    }
+    result = await _get_json(session, semaphore, temp_url, params)
+    return result["main"]["temp"]
+
+
+async def fetch_current_temperatures(cities: list,
+                                     api_key: str,
+                                     max_concurrency: int = MAX_CONCURRENCY,
+                                     timeout: float = REQUEST_TIMEOUT,
+                                     lat_lon_url: str = LAT_LON_URL,
+                                     temp_url: str = TEMP_URL,
+                                     geocache=None):
+    '''
+    Параллельно получаем текущие температуры всех городов в одной сессии.
+    Возвращаем ({город: температура}, {город: текст ошибки}).
+    '''
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        tasks = [async_get_city_current_temperature(city, session, semaphore, api_key,
+                                                    lat_lon_url, temp_url, geocache)
+                 for city in cities]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    temperatures, errors = {}, {}
+    for city, result in zip(cities, results):
+        if isinstance(result, Exception):
+            errors[city] = str(result)
+        else:
+            temperatures[city] = result
+    return temperatures, errors
+
+
+def current_anomalies_table(current_temps: dict,
+                            bounds: SeasonalBounds,
+                            season: str):
+    '''
+    Таблица "какие города аномальны прямо сейчас": одна векторная проверка по всем городам.
+    '''
+    table = pd.DataFrame({"current_temp": pd.Series(current_temps, dtype="float64")}).rename_axis("city")
+    table = table[table.index.isin(bounds.cities)]
+    column = SEASONS.index(season)
+    rows = bounds.cities.get_indexer(table.index)
+    table["lower_bound"] = bounds.lower[rows, column]
+    table["upper_bound"] = bounds.upper[rows, column]
+    table["is_anomaly"] = bounds.check_many(table.index, table["current_temp"], season)
+    return table
@@ -0,0 +1,113 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from profiling import CacheStats
+
+WEATHER_TTL = float(os.getenv("WEATHER_CACHE_TTL", 600))  ### секунд, текущая погода в OpenWeatherMap обновляется примерно раз в 10 минут
+MAX_STALE_TTLS = 6  ### старше 6 × TTL значение уже не выдаем за текущее, даже если обновить его не удалось
+COORDINATE_PRECISION = 4  ### ~10 м, соседние запросы по одному городу попадают в один ключ
+
+logger = logging.getLogger(__name__)
+
+
+def coordinates_key(lat: float,
+                    lon: float,
+                    api_key: str):
+    '''
+    Ключ кэша погоды. В него входит хэш API-ключа: сессия с неверным ключом должна получить ошибку 401,
+    а не температуру, запрошенную с ключом другой сессии.
+    '''
+    key_hash = hashlib.blake2b(api_key.encode(), digest_size=8).hexdigest()
+    return round(lat, COORDINATE_PRECISION), round(lon, COORDINATE_PRECISION), key_hash
+
+
+class TTLCache:
+    '''
+    Общий для всех сессий кэш со временем жизни записей.
+    - одинаковые одновременные запросы ждут один и тот же запрос к API (coalescing);
+    - устаревшее значение отдается сразу, а обновление идет в фоне (stale-while-revalidate);
+    - значение старше max_stale не отдается: get ждет свежий ответ API, а при ошибке пробрасывает ее.
+    '''
+
+    def __init__(self,
+                 ttl: float = WEATHER_TTL,
+                 max_workers: int = 4,
+                 max_stale: float = None):
+        self.ttl = ttl
+        self.max_stale = max_stale if max_stale is not None else MAX_STALE_TTLS * ttl
+        self._values = {}  ### ключ -> (значение, время получения)
+        self._in_flight = {}  ### ключ -> Future текущего запроса
+        self._lock = threading.Lock()
+        self.stats = CacheStats("weather")  ### hit / stale / expired / coalesced / miss
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="weather-refresh")
+
+    def _run(self,
+             key,
+             fetch,
+             future: Future):
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._values[key] = (value, time.monotonic())
+            self._in_flight.pop(key, None)
+        future.set_result(value)
+
+    @staticmethod
+    def _log_refresh_error(key,
+                           future: Future):
+        ### при ошибке фонового обновления продолжаем отдавать устаревшее значение
+        if future.exception() is not None:
+            logger.warning("Background refresh of %s failed: %s", key, future.exception())
+
+    def _refresh_in_background(self,
+                               key,
+                               fetch):
+        future = Future()
+        future.add_done_callback(lambda done: self._log_refresh_error(key, done))
+        self._in_flight[key] = future
+        self._executor.submit(self._run, key, fetch, future)
+
+    def get(self,
+            key,
+            fetch):
+        '''
+        Значение по ключу; fetch() вызывается только при промахе или для фонового обновления.
+        '''
+        with self._lock:
+            cached = self._values.get(key)
+            if cached is not None:
+                value, fetched_at = cached
+                age = time.monotonic() - fetched_at
+                if age <= self.max_stale:
+                    stale = age > self.ttl
+                    if stale and key not in self._in_flight:
+                        self._refresh_in_background(key, fetch)
+                    self.stats["stale" if stale else "hit"] += 1
+                    return value
+                ### слишком старое значение - как промах: ждем уже идущее обновление или запрашиваем сами
+                self.stats["expired"] += 1
+
+            future = self._in_flight.get(key)
+            owner = future is None
+            self.stats["miss" if owner else "coalesced"] += 1
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+
+        ### первый запросивший делает запрос сам, остальные ждут его результат
+        if owner:
+            self._run(key, fetch, future)
+        return future.result()
+
+    def invalidate(self,
+                   key):
+        with self._lock:
+            self._values.pop(key, None)
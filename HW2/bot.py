@@ -1,21 +1,36 @@
 from aiogram import Bot, Dispatcher, types
 from aiogram.fsm.context import FSMContext
-from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.types import Message, FSInputFile, InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
+from aiogram.types import Message, BufferedInputFile, InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
 from aiogram.filters import Command
 from states import ProfileSetup, FoodLogging #, CustomGoal
-from utils import get_city_lat_lon, get_weather, get_food_calories, generate_progress_plot, text_to_emoji, calculate_bmr_with_goal, calculate_water_intake, get_calories_burned
-from config import BOT_TOKEN
+from utils import async_get_city_lat_lon, async_get_weather, async_get_food_calories, render_progress_plot, close_plot_pool, text_to_emoji, calculate_bmr_with_goal, calculate_water_intake, async_get_calories_burned
+from http_client import client
+from config import BOT_TOKEN, STORAGE_URL, FLUSH_INTERVAL, FOOD_CACHE_PATH
+from storage import create_storages
+from food_cache import FoodCache
 from middleware import LoggingMiddleware
 
+### профили и счетчики пользователей, а также состояния FSM переживают перезапуск бота
+users, fsm_storage = create_storages(STORAGE_URL, FLUSH_INTERVAL)
+### поиск OpenFoodFacts медленный, а продукты у пользователей повторяются
+food_cache = FoodCache(FOOD_CACHE_PATH)
+
 bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher(storage=MemoryStorage())
+dp = Dispatcher(storage=fsm_storage)
 dp.message.middleware(LoggingMiddleware())
 dp.callback_query.middleware(LoggingMiddleware())
 
+### общий пул соединений к внешним API живет столько же, сколько бот
+dp.startup.register(client.start)
+dp.shutdown.register(client.close)
+dp.shutdown.register(close_plot_pool)
+
+### счетчики меняются в памяти и пачками сбрасываются в хранилище раз в FLUSH_INTERVAL секунд
+dp.startup.register(users.start)
+dp.shutdown.register(users.close)
+dp.shutdown.register(fsm_storage.close)  ### Dispatcher сам не закрывает storage
+dp.shutdown.register(food_cache.close)
 
-### хранение данных пользователей в памяти
-users = {}
 
 ################################################################################################начало работы бота
 @dp.message(Command("start"))
@@ -135,7 +150,7 @@ async def process_city(message: Message, state: FSMContext):
     city = message.text
     try:
         ### валидация, что введенный город существует
-        lat, lon = get_city_lat_lon(city)
+        lat, lon = await async_get_city_lat_lon(city)
     except Exception as e:
         await message.reply(f"⚠️ The city '{city}' was not found. Please try again.")
         return None
@@ -245,7 +260,12 @@ async def log_food(message: Message, state: FSMContext):
         return None
 
     food_name = message.text.split(maxsplit=1)[-1]
-    calories = get_food_calories(food_name)['calories']
+    try:
+        food = await food_cache.get(food_name, async_get_food_calories)
+    except Exception:  ### таймаут или ошибка OpenFoodFacts - это не "продукт не найден", кэш ее не запоминает
+        await message.reply(f"⚠️ Sorry, I couldn't look up '{food_name}' right now. Please try again in a minute.")
+        return None
+    calories = food['calories'] if food else None
 
     if calories is None:
         await message.reply(f"⚠️ Sorry, I couldn't find any information on '{food_name}'. Please try a different food.")
@@ -314,7 +334,11 @@ async def log_workout(message: Message):
         await message.reply("⚠️ Please use the correct format: /log_workout <activity> <duration in minutes>. Example: /log_workout running 30")
         return None
 
-    calories_burned = get_calories_burned(activity, duration)
+    try:
+        calories_burned = await async_get_calories_burned(activity, duration)
+    except Exception:  ### таймаут или ошибка API Ninjas
+        await message.reply(f"⚠️ Sorry, I couldn't look up the activity '{activity}' right now. Please try again in a minute.")
+        return None
     if calories_burned is None:
         await message.reply(f"⚠️ Sorry, I couldn't find information for the activity '{activity}'. Please try a different workout.")
         return None
@@ -338,16 +362,21 @@ async def check_progress(message: Message):
         return None
 
     user = users[user_id]
-    temp = get_weather(user["city"])
+    try:
+        temp = await async_get_weather(user["city"])
+    except Exception:  ### без погоды прогресс все равно показываем, просто без надбавки за жару
+        temp = None
     temp_water_bonus = 500 if temp and temp > 25 else 0
 
     water_goal = user["water_goal"] + temp_water_bonus
     calorie_goal = user["calorie_goal"]
 
-    generate_progress_plot(user["logged_water"], water_goal, user["logged_calories"], calorie_goal)
-    photo = FSInputFile("progress.png")
+    ### график рисуется в пуле потоков в память - без общего файла на диске, который перезаписывают соседние запросы
+    plot = await render_progress_plot(user["logged_water"], water_goal, user["logged_calories"], calorie_goal)
+    photo = BufferedInputFile(plot, filename="progress.png")
 
-    await message.answer_photo(photo, caption=f"🌡 Temperature in the city {user['city']}: {temp}°C\n\n"
+    await message.answer_photo(photo, caption=f"🌡 Temperature in the city {user['city']}: "
+                                              f"{f'{temp}°C' if temp is not None else 'unavailable'}\n\n"
                                               f"📈 Progress:\n\n"
                                               f"💧 Water intake:\n"
                                               f"💧 {user['logged_water']} ml out of {water_goal} ml\n"
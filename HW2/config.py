@@ -8,3 +8,12 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 API_NINJAS_KEY = os.getenv("API_NINJAS_KEY")
 if not WEATHER_API_KEY or not BOT_TOKEN or not API_NINJAS_KEY:
     raise ValueError("Problem with tokens: WEATHER_API_KEY and/or BOT_TOKEN and/or API_NINJAS_KEY")
+
+### точка монтирования persistent disk на Render: рабочая папка контейнера стирается при каждом редеплое
+DATA_DIR = os.getenv("DATA_DIR", "/var/data" if os.path.isdir("/var/data") else ".")
+### sqlite-файл (по умолчанию на подключенном диске, локально - рядом с ботом) или redis://...
+STORAGE_URL = os.getenv("STORAGE_URL", os.path.join(DATA_DIR, "bot.sqlite"))
+FLUSH_INTERVAL = float(os.getenv("FLUSH_INTERVAL", 5))  ### секунд между сбросами профилей и счетчиков на диск
+FOOD_CACHE_PATH = os.getenv("FOOD_CACHE_PATH", os.path.join(DATA_DIR, "food_cache.sqlite"))  ### кэш ответов OpenFoodFacts
+### локальный индекс калорийности (nutrition_index.py import ... --index $DATA_DIR/nutrition.sqlite)
+NUTRITION_INDEX_PATH = os.getenv("NUTRITION_INDEX_PATH", os.path.join(DATA_DIR, "nutrition.sqlite"))
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+FOOD_TTL = 7 * 24 * 3600  ### калорийность продуктов почти не меняется
+NOT_FOUND_TTL = 24 * 3600  ### "не найдено" храним меньше: продукт могут добавить в OpenFoodFacts
+LRU_SIZE = 2048
+PURGE_INTERVAL = 3600  ### как часто удаляем из SQLite истекшие записи (и при каждом запуске)
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_food(food_name: str):
+    """
+    "  Banana " and "banana" are the same query
+    """
+    return " ".join(food_name.split()).casefold()
+
+
+class FoodCache:
+    """
+    Cache in front of the food calories lookup: LRU with TTL in memory on top of a SQLite table.
+    - "not found" answers are cached too (for a shorter time);
+    - concurrent lookups of the same food wait for one upstream request (single-flight);
+    - hit/miss counters are kept in stats;
+    - expired rows are deleted from SQLite on startup and then at most once per PURGE_INTERVAL.
+    """
+
+    def __init__(self,
+                 path: str,
+                 ttl: float = FOOD_TTL,
+                 not_found_ttl: float = NOT_FOUND_TTL,
+                 lru_size: int = LRU_SIZE):
+        self.ttl = ttl
+        self.not_found_ttl = not_found_ttl
+        self.lru_size = lru_size
+        self.stats = Counter()  ### memory_hit / disk_hit / not_found_hit / coalesced / miss / error
+        self._lru = OrderedDict()  ### ключ -> (результат или None, когда истекает)
+        self._in_flight = {}  ### ключ -> Future текущего запроса к API
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS food "
+                                 "(query TEXT PRIMARY KEY, data TEXT, expires_at REAL NOT NULL)")
+        self._connection.commit()
+        self._purged_at = 0.0
+        self._purge_expired(time.time())
+
+    def _purge_expired(self,
+                       now: float):
+        ### вызывается под self._lock или до того, как кэш начали использовать
+        with self._connection:
+            deleted = self._connection.execute("DELETE FROM food WHERE expires_at <= ?", (now,)).rowcount
+        self._purged_at = now
+        if deleted:
+            logger.info("Deleted %d expired food cache rows", deleted)
+
+    def _remember(self,
+                  key: str,
+                  value,
+                  expires_at: float):
+        self._lru[key] = (value, expires_at)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _load(self,
+              key: str):
+        with self._lock:
+            return self._connection.execute("SELECT data, expires_at FROM food WHERE query = ?", (key,)).fetchone()
+
+    def _store(self,
+               key: str,
+               value,
+               expires_at: float):
+        with self._lock:
+            with self._connection:
+                self._connection.execute("INSERT OR REPLACE INTO food VALUES (?, ?, ?)",
+                                         (key, json.dumps(value) if value is not None else None, expires_at))
+            now = time.time()
+            if now - self._purged_at > PURGE_INTERVAL:
+                self._purge_expired(now)
+
+    def _hit(self,
+             source: str,
+             value):
+        self.stats["not_found_hit" if value is None else source] += 1
+        return value
+
+    async def get(self,
+                  food_name: str,
+                  fetch):
+        """
+        Cached result of await fetch(normalized food name); None means the food was not found.
+        """
+        key = normalize_food(food_name)
+        now = time.time()
+
+        cached = self._lru.get(key)
+        if cached is not None and cached[1] > now:
+            self._lru.move_to_end(key)
+            return self._hit("memory_hit", cached[0])
+
+        row = await asyncio.to_thread(self._load, key)
+        if row is not None and row[1] > now:
+            value = json.loads(row[0]) if row[0] is not None else None
+            self._remember(key, value, row[1])
+            return self._hit("disk_hit", value)
+
+        ### первый запросивший идет в API, остальные ждут его результат
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+            ### отменили запрос-владельца, а не нас - пробуем сами
+            return await self.get(food_name, fetch)
+
+        self.stats["miss"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await fetch(key)
+        except Exception as e:
+            ### ошибки API не кэшируем, следующий запрос попробует снова
+            self.stats["error"] += 1
+            future.set_exception(e)
+            future.exception()  ### помечаем исключение полученным, если ожидающих не было
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+        expires_at = time.time() + (self.ttl if value is not None else self.not_found_ttl)
+        self._remember(key, value, expires_at)
+        future.set_result(value)
+        await asyncio.to_thread(self._store, key, value, expires_at)
+        return value
+
+    async def close(self):
+        logger.info("Food cache stats: %s", dict(self.stats))
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,60 @@
+import asyncio
+import aiohttp
+
+### таймаут (сек) и лимит одновременных запросов на каждый внешний сервис
+UPSTREAMS = {
+    "openweathermap": {"timeout": 5, "limit": 10},
+    "openfoodfacts": {"timeout": 10, "limit": 5},  ### поиск OpenFoodFacts заметно медленнее остальных
+    "api_ninjas": {"timeout": 5, "limit": 5},
+}
+POOL_SIZE = 30  ### всего открытых соединений в пуле
+DNS_CACHE_TTL = 300
+
+
+class HttpClient:
+    """
+    Shared aiohttp session for all upstream APIs.
+    Created on bot startup and closed on shutdown; every upstream has its own timeout and concurrency limit,
+    so one slow service can neither block the event loop nor take all pooled connections.
+    """
+
+    def __init__(self,
+                 upstreams: dict = UPSTREAMS,
+                 pool_size: int = POOL_SIZE):
+        self.upstreams = upstreams
+        self.pool_size = pool_size
+        self._session = None
+        self._semaphores = {}
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=DNS_CACHE_TTL)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphores = {name: asyncio.Semaphore(upstream["limit"])
+                                for name, upstream in self.upstreams.items()}
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_json(self,
+                       upstream: str,
+                       url: str,
+                       params: dict = None,
+                       headers: dict = None):
+        """
+        GET request to the given upstream, returns (status, parsed JSON or response text).
+        """
+        if self._session is None:
+            await self.start()
+        timeout = aiohttp.ClientTimeout(total=self.upstreams[upstream]["timeout"])
+        async with self._semaphores[upstream]:
+            async with self._session.get(url, params=params, headers=headers, timeout=timeout) as response:
+                if response.status == 200:
+                    return response.status, await response.json(content_type=None)
+                return response.status, await response.text()
+
+
+### один клиент на процесс бота
+client = HttpClient()
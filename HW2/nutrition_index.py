@@ -0,0 +1,270 @@
+import argparse
+import csv
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from food_cache import normalize_food
+
+MIN_SIMILARITY = 0.45  ### доля общих триграмм, ниже которой слово с опечаткой не исправляем
+CANDIDATES = 20  ### сколько кандидатов сравниваем с запросом
+ALPHABET_SIZE = 128  ### сколько самых частых символов словаря подставляем при исправлении опечаток
+### вариантов правки ~2 * длина * алфавит: длиннее этого слова их слишком много для одного IN-запроса (и лимита
+### переменных SQLite), такие слова сразу исправляем по триграммам - на длинном слове одна опечатка их почти не меняет
+MAX_EDIT_LENGTH = 20
+BATCH_SIZE = 10000
+
+### колонки выгрузки OpenFoodFacts и простого CSV "name,kcal"
+NAME_COLUMNS = ["product_name", "name"]
+KCAL_COLUMNS = ["energy-kcal_100g", "kcal", "calories"]
+WORD = re.compile(r"\w+")  ### слова так же, как их режет токенайзер unicode61
+
+
+FOODS_TABLE = "(id INTEGER PRIMARY KEY, normalized TEXT UNIQUE NOT NULL, name TEXT NOT NULL, kcal REAL NOT NULL)"
+
+
+def pad(word: str):
+    ### пробелы по краям дают триграммы начала и конца слова, так короткие слова с опечаткой не теряют всё сходство
+    return f"  {word} "
+
+
+def trigrams(text: str):
+    text = pad(text)
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def similarity(first: str,
+               second: str):
+    first, second = trigrams(first), trigrams(second)
+    return len(first & second) / len(first | second)
+
+
+def edits(word: str,
+          letters: str):
+    """
+    All strings one deletion, transposition, replacement or insertion (from letters) away from the word
+    """
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    return ({left + right[1:] for left, right in splits if right}
+            | {left + right[1] + right[0] + right[2:] for left, right in splits if len(right) > 1}
+            | {left + letter + right[1:] for left, right in splits if right for letter in letters}
+            | {left + letter + right for left, right in splits for letter in letters})
+
+
+def _quote(text: str):
+    return '"' + text.replace('"', '""') + '"'
+
+
+class NutritionIndex:
+    """
+    Local food -> kcal/100g index in SQLite.
+    Lookup order: exact normalized name -> names containing every query word in any order (FTS5 word index)
+    -> the same after fixing typos against the vocabulary of words from all names (FTS5 trigram index).
+    """
+
+    def __init__(self,
+                 path: str):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(f"""
+            CREATE TABLE IF NOT EXISTS foods {FOODS_TABLE};
+            CREATE VIRTUAL TABLE IF NOT EXISTS foods_fts USING fts5(normalized, content='foods', content_rowid='id',
+                                                                    tokenize='unicode61 remove_diacritics 2');
+            CREATE TABLE IF NOT EXISTS words (id INTEGER PRIMARY KEY, word TEXT UNIQUE NOT NULL, padded TEXT NOT NULL,
+                                              count INTEGER NOT NULL);
+            CREATE VIRTUAL TABLE IF NOT EXISTS words_fts USING fts5(padded, content='words', content_rowid='id',
+                                                                    tokenize='trigram');
+            CREATE TABLE IF NOT EXISTS letters (letter TEXT PRIMARY KEY, count INTEGER NOT NULL);
+        """)
+        self._letters = None
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM foods").fetchone()[0]
+
+    def add_many(self,
+                 rows):
+        """
+        Add (name, kcal per 100g) pairs; the first entry for a normalized name wins.
+        """
+        with self._lock, self._connection:
+            before = self._connection.total_changes
+            self._connection.executemany("INSERT OR IGNORE INTO foods (normalized, name, kcal) VALUES (?, ?, ?)",
+                                         ((normalize_food(name), name, kcal) for name, kcal in rows))
+            added = self._connection.total_changes - before
+        return added
+
+    def rebuild(self):
+        """
+        Rebuild the vocabulary and search indexes after import (one pass instead of updating them per row)
+        """
+        with self._lock, self._connection:
+            ### перенумеровываем продукты по длине названия: поиск идет по rowid и первыми находит самые короткие
+            self._connection.execute(f"CREATE TABLE foods_sorted {FOODS_TABLE}")
+            self._connection.execute("INSERT INTO foods_sorted (normalized, name, kcal) "
+                                     "SELECT normalized, name, kcal FROM foods ORDER BY length(normalized), id")
+            self._connection.execute("DROP TABLE foods")
+            self._connection.execute("ALTER TABLE foods_sorted RENAME TO foods")
+            words = Counter(word for (name,) in self._connection.execute("SELECT normalized FROM foods")
+                            for word in WORD.findall(name))
+            self._connection.execute("DELETE FROM words")
+            self._connection.executemany("INSERT INTO words (word, padded, count) VALUES (?, ?, ?)",
+                                         ((word, pad(word), count) for word, count in words.items()))
+            ### алфавит для исправления опечаток - символы самих названий (кириллица, латиница, цифры...)
+            letters = Counter()
+            for word, count in words.items():
+                for letter in word:
+                    letters[letter] += count
+            self._connection.execute("DELETE FROM letters")
+            self._connection.executemany("INSERT INTO letters (letter, count) VALUES (?, ?)", letters.items())
+            self._letters = None
+            self._connection.execute("INSERT INTO foods_fts(foods_fts) VALUES ('rebuild')")
+            self._connection.execute("INSERT INTO words_fts(words_fts) VALUES ('rebuild')")
+
+    def lookup(self,
+               food_name: str):
+        """
+        Best match in the same format as get_food_calories, or None if nothing is similar enough
+        """
+        query = normalize_food(food_name)
+        with self._lock:
+            row = self._exact(query) or self._search(query)
+            if row is None:
+                corrected = " ".join(self._correct(word) for word in WORD.findall(query))
+                row = self._exact(corrected) or self._search(corrected) if corrected != query else None
+        if row is None:
+            return None
+        return {'name': row[0], 'calories': row[1]}
+
+    def _exact(self,
+               query: str):
+        return self._connection.execute("SELECT name, kcal FROM foods WHERE normalized = ?", (query,)).fetchone()
+
+    def _search(self,
+                query: str):
+        """
+        Closest name that contains every query word; short names win, as "banana" is a better answer than "banana chips"
+        """
+        words = WORD.findall(query)
+        if not words:
+            return None
+        ### rowid растет с длиной названия, поэтому первые CANDIDATES совпадений - самые короткие, и поиск на них и останавливается
+        candidates = self._connection.execute(
+            "SELECT foods.normalized, foods.name, foods.kcal "
+            "FROM (SELECT rowid FROM foods_fts WHERE foods_fts MATCH ? LIMIT ?) AS hits JOIN foods ON foods.id = hits.rowid",
+            (" AND ".join(_quote(word) for word in words), CANDIDATES)).fetchall()
+        if not candidates:
+            return None
+        return max(candidates, key=lambda candidate: similarity(query, candidate[0]))[1:]
+
+    def _alphabet(self):
+        """
+        The most frequent characters of the vocabulary, loaded once per rebuild
+        """
+        if self._letters is None:
+            rows = self._connection.execute("SELECT letter FROM letters ORDER BY count DESC LIMIT ?",
+                                            (ALPHABET_SIZE,)).fetchall()
+            if rows:
+                self._letters = "".join(letter for (letter,) in rows)
+            else:
+                ### индекс собран до появления таблицы letters - считаем алфавит по словарю
+                letters = Counter()
+                for word, count in self._connection.execute("SELECT word, count FROM words"):
+                    for letter in word:
+                        letters[letter] += count
+                self._letters = "".join(letter for letter, _ in letters.most_common(ALPHABET_SIZE))
+        return self._letters
+
+    def _correct(self,
+                 word: str):
+        """
+        The most similar vocabulary word, or the word itself if it is known or nothing is similar enough
+        """
+        if self._connection.execute("SELECT 1 FROM words WHERE word = ?", (word,)).fetchone():
+            return word
+        ### обычно опечатка - одна буква: проверяем все такие варианты по индексу и берем самое частое слово
+        if len(word) <= MAX_EDIT_LENGTH:
+            candidates = list(edits(word, self._alphabet()))
+            best = self._connection.execute(f"SELECT word FROM words WHERE word IN ({','.join('?' * len(candidates))}) "
+                                            "ORDER BY count DESC LIMIT 1", candidates).fetchone()
+            if best is not None:
+                return best[0]
+        ### любая общая триграмма делает слово кандидатом, bm25 ставит выше совпадения по редким триграммам
+        match = " OR ".join(_quote(trigram) for trigram in trigrams(word))
+        candidates = self._connection.execute(
+            "SELECT words.word FROM words_fts JOIN words ON words.id = words_fts.rowid "
+            "WHERE words_fts MATCH ? ORDER BY rank LIMIT ?", (match, CANDIDATES)).fetchall()
+        best = max((candidate for (candidate,) in candidates), key=lambda candidate: similarity(word, candidate),
+                   default=None)
+        return best if best is not None and similarity(word, best) >= MIN_SIMILARITY else word
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def read_foods(path: str,
+               name_column: str = None,
+               kcal_column: str = None):
+    """
+    Stream (name, kcal) pairs from an OpenFoodFacts export (tab-separated) or a CSV with name and kcal columns
+    """
+    csv.field_size_limit(sys.maxsize)  ### в выгрузке OpenFoodFacts встречаются очень длинные поля
+    with open(path, newline="", encoding="utf-8") as file:
+        delimiter = "\t" if "\t" in file.readline() else ","
+        file.seek(0)
+        reader = csv.DictReader(file, delimiter=delimiter)
+        name_column = name_column or next((column for column in NAME_COLUMNS if column in reader.fieldnames), None)
+        kcal_column = kcal_column or next((column for column in KCAL_COLUMNS if column in reader.fieldnames), None)
+        if name_column is None or kcal_column is None:
+            raise ValueError(f"Cannot find name/kcal columns in {path}, pass --name-column and --kcal-column")
+
+        for row in reader:
+            name = (row.get(name_column) or "").strip()
+            try:
+                kcal = float(row.get(kcal_column) or "")
+            except ValueError:
+                continue
+            if name and 0 <= kcal <= 1000:  ### даже у чистого жира ~900 ккал на 100 г - остальное ошибки в данных
+                yield name, kcal
+
+
+def import_foods(index: NutritionIndex,
+                 path: str,
+                 name_column: str = None,
+                 kcal_column: str = None):
+    batch, added = [], 0
+    for row in read_foods(path, name_column, kcal_column):
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            added += index.add_many(batch)
+            batch = []
+    added += index.add_many(batch)
+    index.rebuild()
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local nutrition index (food name -> kcal per 100 g)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="import an OpenFoodFacts export or a name,kcal CSV")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--name-column")
+    import_parser.add_argument("--kcal-column")
+    search_parser = subparsers.add_parser("search", help="look up a food in the index")
+    search_parser.add_argument("food_name")
+    parser.add_argument("--index", default="nutrition.sqlite")
+    args = parser.parse_args()
+
+    index = NutritionIndex(args.index)
+    if args.command == "import":
+        start_time = time.perf_counter()
+        added = import_foods(index, args.path, args.name_column, args.kcal_column)
+        print(f"Imported {added} foods in {time.perf_counter() - start_time:.1f} s, {len(index)} in the index")
+    else:
+        start_time = time.perf_counter()
+        result = index.lookup(args.food_name)
+        print(f"{result} in {(time.perf_counter() - start_time) * 1000:.2f} ms")
+    index.close()
@@ -0,0 +1,269 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+
+FLUSH_INTERVAL = 5  ### секунд между сбросами изменений профилей на диск
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteBackend:
+    """
+    Users table in SQLite: one JSON document per user
+    """
+
+    def __init__(self,
+                 path: str):
+        self._lock = threading.Lock()
+        ### соединение используется из потоков asyncio.to_thread, поэтому доступ сериализуем блокировкой
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS users (user_id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+        self._connection.commit()
+
+    def load_all(self):
+        with self._lock:
+            rows = self._connection.execute("SELECT user_id, data FROM users").fetchall()
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    def save_many(self,
+                  records: dict):
+        ### вся пачка - одна транзакция
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO users VALUES (?, ?)",
+                                         [(user_id, json.dumps(data)) for user_id, data in records.items()])
+
+    def delete_many(self,
+                    user_ids: set):
+        with self._lock, self._connection:
+            self._connection.executemany("DELETE FROM users WHERE user_id = ?", [(user_id,) for user_id in user_ids])
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class RedisBackend:
+    """
+    Users hash in Redis: field - user id, value - JSON document (needs the optional redis package)
+    """
+
+    def __init__(self,
+                 url: str,
+                 key: str = "users"):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self.key = key
+
+    def load_all(self):
+        return {int(user_id): json.loads(data) for user_id, data in self._redis.hgetall(self.key).items()}
+
+    def save_many(self,
+                  records: dict):
+        self._redis.hset(self.key, mapping={user_id: json.dumps(data) for user_id, data in records.items()})
+
+    def delete_many(self,
+                    user_ids: set):
+        self._redis.hdel(self.key, *user_ids)
+
+    def close(self):
+        self._redis.close()
+
+
+class _UserRecord(dict):
+    """
+    User profile dict that marks itself dirty in the store on every change
+    """
+
+    def __init__(self,
+                 store,
+                 user_id: int,
+                 data: dict):
+        super().__init__(data)
+        self._store = store
+        self._user_id = user_id
+
+    def __setitem__(self,
+                    key,
+                    value):
+        super().__setitem__(key, value)
+        self._store.mark_dirty(self._user_id)
+
+    def __delitem__(self,
+                    key):
+        super().__delitem__(key)
+        self._store.mark_dirty(self._user_id)
+
+    def update(self,
+               *args,
+               **kwargs):
+        super().update(*args, **kwargs)
+        self._store.mark_dirty(self._user_id)
+
+
+class UserStore(MutableMapping):
+    """
+    Drop-in replacement for the users dict with write-behind persistence.
+    Reads and writes (including counters like users[id]["logged_water"] += 500) hit memory only;
+    changed and deleted users are written to the backend in one batch every flush_interval seconds and on shutdown,
+    so a crash loses at most one flush interval.
+    """
+
+    def __init__(self,
+                 backend,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self._users = {}
+        self._dirty = set()
+        self._deleted = set()  ### удаленные пользователи, которых еще надо стереть в хранилище
+        self._flush_task = None
+
+    async def start(self):
+        ### пользователей немного, поэтому при старте поднимаем всех в память
+        records = await asyncio.to_thread(self.backend.load_all)
+        self._users = {user_id: _UserRecord(self, user_id, data) for user_id, data in records.items()}
+        self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("Failed to flush users: %s", e)
+
+    async def flush(self):
+        if not self._dirty and not self._deleted:
+            return 0
+        ### снимок изменившихся и удаленных записей; изменения во время записи попадут в следующую пачку
+        dirty, self._dirty = self._dirty, set()
+        deleted, self._deleted = self._deleted, set()
+        batch = {user_id: dict(self._users[user_id]) for user_id in dirty if user_id in self._users}
+        try:
+            if deleted:
+                await asyncio.to_thread(self.backend.delete_many, deleted)
+            if batch:
+                await asyncio.to_thread(self.backend.save_many, batch)
+        except Exception:
+            ### пользователя могли завести заново, пока шла запись - тогда его удаление уже не нужно
+            self._deleted |= deleted - self._users.keys()
+            self._dirty |= dirty
+            raise
+        return len(batch) + len(deleted)
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        try:
+            await self.flush()
+        finally:
+            self.backend.close()
+
+    def mark_dirty(self,
+                   user_id: int):
+        self._dirty.add(user_id)
+
+    def __getitem__(self,
+                    user_id: int):
+        return self._users[user_id]
+
+    def __setitem__(self,
+                    user_id: int,
+                    data: dict):
+        self._users[user_id] = _UserRecord(self, user_id, data)
+        self._deleted.discard(user_id)
+        self.mark_dirty(user_id)
+
+    def __delitem__(self,
+                    user_id: int):
+        del self._users[user_id]
+        self._dirty.discard(user_id)
+        self._deleted.add(user_id)
+
+    def __contains__(self,
+                     user_id):
+        return user_id in self._users
+
+    def __iter__(self):
+        return iter(self._users)
+
+    def __len__(self):
+        return len(self._users)
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    aiogram FSM storage in SQLite (states change rarely, so they are written through)
+    """
+
+    def __init__(self,
+                 path: str):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS fsm "
+                                 "(key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL DEFAULT '{}')")
+        self._connection.commit()
+
+    @staticmethod
+    def _key(key: StorageKey):
+        return ":".join(str(part) for part in (key.bot_id, key.chat_id, key.user_id, key.thread_id,
+                                               key.business_connection_id, key.destiny))
+
+    def _execute(self,
+                 query: str,
+                 params: tuple):
+        with self._lock, self._connection:
+            return self._connection.execute(query, params).fetchone()
+
+    async def set_state(self,
+                        key: StorageKey,
+                        state=None):
+        state = state.state if isinstance(state, State) else state
+        await asyncio.to_thread(self._execute,
+                                "INSERT INTO fsm (key, state) VALUES (?, ?) "
+                                "ON CONFLICT(key) DO UPDATE SET state = excluded.state",
+                                (self._key(key), state))
+
+    async def get_state(self,
+                        key: StorageKey):
+        row = await asyncio.to_thread(self._execute, "SELECT state FROM fsm WHERE key = ?", (self._key(key),))
+        return row[0] if row else None
+
+    async def set_data(self,
+                       key: StorageKey,
+                       data):
+        await asyncio.to_thread(self._execute,
+                                "INSERT INTO fsm (key, data) VALUES (?, ?) "
+                                "ON CONFLICT(key) DO UPDATE SET data = excluded.data",
+                                (self._key(key), json.dumps(dict(data))))
+
+    async def get_data(self,
+                       key: StorageKey):
+        row = await asyncio.to_thread(self._execute, "SELECT data FROM fsm WHERE key = ?", (self._key(key),))
+        return json.loads(row[0]) if row else {}
+
+    async def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def create_storages(url: str,
+                    flush_interval: float = FLUSH_INTERVAL):
+    """
+    User store and FSM storage for the given url: redis://... (optional redis package) or a SQLite file path
+    """
+    if url.startswith(("redis://", "rediss://")):
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        return UserStore(RedisBackend(url), flush_interval), RedisStorage.from_url(url)
+    path = url.removeprefix("sqlite:///")
+    return UserStore(SQLiteBackend(path), flush_interval), SQLiteStorage(path)
@@ -0,0 +1,127 @@
+import asyncio
+import time
+import pytest
+from food_cache import FoodCache
+
+BANANA = {"name": "banana", "calories": 89}
+
+
+class Upstream:
+    """
+    Stand-in for the OpenFoodFacts lookup that counts calls
+    """
+
+    def __init__(self,
+                 results: dict = None,
+                 delay: float = 0,
+                 errors: int = 0):
+        self.results = results or {}
+        self.delay = delay
+        self.errors = errors
+        self.calls = []
+
+    async def __call__(self,
+                       key: str):
+        self.calls.append(key)
+        await asyncio.sleep(self.delay)
+        if self.errors:
+            self.errors -= 1
+            raise RuntimeError("upstream is down")
+        return self.results.get(key)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "food_cache.sqlite")
+
+
+def test_concurrent_lookups_share_one_upstream_request(path):
+    upstream = Upstream({"banana": BANANA}, delay=0.1)
+
+    async def scenario():
+        cache = FoodCache(path)
+        results = await asyncio.gather(*(cache.get(name, upstream) for name in ["banana", " Banana", "BANANA "] * 2))
+        await cache.close()
+        return cache, results
+
+    cache, results = asyncio.run(scenario())
+    assert results == [BANANA] * 6
+    assert upstream.calls == ["banana"]
+    assert cache.stats["miss"] == 1
+    assert cache.stats["coalesced"] == 5
+
+
+def test_not_found_is_cached_for_not_found_ttl(path):
+    upstream = Upstream()
+
+    async def scenario():
+        cache = FoodCache(path, not_found_ttl=0.2)
+        first = await cache.get("unicorn steak", upstream)
+        second = await cache.get("unicorn steak", upstream)
+        await asyncio.sleep(0.3)
+        third = await cache.get("unicorn steak", upstream)
+        await cache.close()
+        return cache, (first, second, third)
+
+    cache, results = asyncio.run(scenario())
+    assert results == (None, None, None)
+    assert upstream.calls == ["unicorn steak", "unicorn steak"]
+    assert cache.stats["not_found_hit"] == 1
+
+
+def test_upstream_errors_are_not_cached(path):
+    upstream = Upstream({"banana": BANANA}, errors=1)
+
+    async def scenario():
+        cache = FoodCache(path)
+        with pytest.raises(RuntimeError):
+            await cache.get("banana", upstream)
+        result = await cache.get("banana", upstream)
+        await cache.close()
+        return cache, result
+
+    cache, result = asyncio.run(scenario())
+    assert result == BANANA
+    assert upstream.calls == ["banana", "banana"]
+    assert cache.stats["error"] == 1
+
+
+def test_evicted_entries_are_served_from_sqlite_and_survive_restart(path):
+    upstream = Upstream({"apple": {"name": "apple", "calories": 52}, "banana": BANANA,
+                         "cherry": {"name": "cherry", "calories": 50}})
+
+    async def scenario():
+        cache = FoodCache(path, lru_size=2)
+        for name in ("apple", "banana", "cherry"):
+            await cache.get(name, upstream)
+        lru_keys = list(cache._lru)
+        apple = await cache.get("apple", upstream)
+        await cache.close()
+
+        reopened = FoodCache(path)
+        banana = await reopened.get("banana", upstream)
+        await reopened.close()
+        return cache, reopened, lru_keys, apple, banana
+
+    cache, reopened, lru_keys, apple, banana = asyncio.run(scenario())
+    assert lru_keys == ["banana", "cherry"]
+    assert apple == {"name": "apple", "calories": 52}
+    assert banana == BANANA
+    assert cache.stats["disk_hit"] == 1
+    assert reopened.stats["disk_hit"] == 1
+    assert upstream.calls == ["apple", "banana", "cherry"]
+
+
+def test_expired_rows_are_purged_on_startup(path):
+    upstream = Upstream({"banana": BANANA})
+
+    async def scenario():
+        cache = FoodCache(path, ttl=0.1)
+        await cache.get("banana", upstream)
+        await cache.close()
+
+    asyncio.run(scenario())
+    time.sleep(0.2)
+    reopened = FoodCache(path)
+    assert reopened._connection.execute("SELECT COUNT(*) FROM food").fetchone()[0] == 0
+    asyncio.run(reopened.close())
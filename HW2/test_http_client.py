@@ -0,0 +1,106 @@
+import asyncio
+import os
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+### config требует токены при импорте; настоящие запросы тесты не делают
+for name in ("WEATHER_API_KEY", "BOT_TOKEN", "API_NINJAS_KEY"):
+    os.environ.setdefault(name, "test")
+
+import utils
+from http_client import UPSTREAMS, HttpClient
+
+FOOD_DELAY = 1.0
+
+
+async def geo(request: web.Request):
+    return web.json_response([{"lat": 55.75, "lon": 37.62}])
+
+
+async def weather(request: web.Request):
+    return web.json_response({"main": {"temp": 21.5}})
+
+
+async def food(request: web.Request):
+    await asyncio.sleep(FOOD_DELAY)
+    return web.json_response({"products": [{"product_name": "banana", "nutriments": {"energy-kcal_100g": 89}}]})
+
+
+async def workout(request: web.Request):
+    return web.json_response([{"calories_per_hour": 600}])
+
+
+@asynccontextmanager
+async def stub_upstreams(monkeypatch,
+                         upstreams: dict = UPSTREAMS):
+    """
+    Local server standing in for every upstream API, with utils pointed at it through a fresh client
+    """
+    app = web.Application()
+    app.router.add_get("/geo", geo)
+    app.router.add_get("/weather", weather)
+    app.router.add_get("/food", food)
+    app.router.add_get("/workout", workout)
+    async with TestServer(app) as server:
+        client = HttpClient(upstreams=upstreams)
+        monkeypatch.setattr(utils, "client", client)
+        monkeypatch.setattr(utils, "nutrition_index", None)
+        monkeypatch.setattr(utils, "LAT_LON_URL", str(server.make_url("/geo")))
+        monkeypatch.setattr(utils, "WEATHER_URL", str(server.make_url("/weather")))
+        monkeypatch.setattr(utils, "FOOD_API_URL", str(server.make_url("/food")) + "?q={}")
+        monkeypatch.setattr(utils, "WORKOUT_API_URL", str(server.make_url("/workout")) + "?activity={}")
+        try:
+            yield
+        finally:
+            await client.close()
+
+
+def test_slow_food_lookup_does_not_block_other_upstreams(monkeypatch):
+    async def scenario():
+        async with stub_upstreams(monkeypatch):
+            start_time = time.perf_counter()
+            food_task = asyncio.create_task(utils.async_get_food_calories("banana"))
+            temperature, burned = await asyncio.gather(utils.async_get_weather("Moscow"),
+                                                       utils.async_get_calories_burned("running", 30))
+            elapsed = time.perf_counter() - start_time
+            pending = not food_task.done()
+            return temperature, burned, elapsed, pending, await food_task
+
+    temperature, burned, elapsed, food_pending, food_result = asyncio.run(scenario())
+
+    assert temperature == 21.5
+    assert burned == 300
+    assert food_pending
+    assert elapsed < FOOD_DELAY / 2
+    assert food_result == {"name": "banana", "calories": 89}
+
+
+def test_slow_food_lookup_times_out(monkeypatch):
+    upstreams = {**UPSTREAMS, "openfoodfacts": {"timeout": FOOD_DELAY / 4, "limit": 5}}
+
+    async def scenario():
+        async with stub_upstreams(monkeypatch, upstreams):
+            await utils.async_get_food_calories("banana")
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(scenario())
+
+
+
+class BrokenIndex:
+    def lookup(self,
+               food_name: str):
+        raise sqlite3.DatabaseError("database disk image is malformed")
+
+
+def test_broken_local_index_falls_back_to_openfoodfacts(monkeypatch):
+    async def scenario():
+        async with stub_upstreams(monkeypatch):
+            monkeypatch.setattr(utils, "nutrition_index", BrokenIndex())
+            return await utils.async_get_food_calories("banana")
+
+    assert asyncio.run(scenario()) == {"name": "banana", "calories": 89}
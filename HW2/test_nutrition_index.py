@@ -0,0 +1,52 @@
+import pytest
+from nutrition_index import MAX_EDIT_LENGTH, NutritionIndex, import_foods
+
+
+@pytest.fixture
+def index(tmp_path):
+    csv_path = tmp_path / "foods.csv"
+    csv_path.write_text("name,kcal\n"
+                        "Banana,89\n"
+                        "Banana chips,519\n"
+                        "Greek yogurt natural,97\n"
+                        "Молоко,60\n"
+                        "Молоко шоколадное,80\n"
+                        "Broken row,not a number\n", encoding="utf-8")
+    index = NutritionIndex(str(tmp_path / "nutrition.sqlite"))
+    assert import_foods(index, str(csv_path)) == 5
+    yield index
+    index.close()
+
+
+def test_exact_lookup_ignores_case_and_spaces(index):
+    assert index.lookup("  BANANA ") == {"name": "Banana", "calories": 89.0}
+    assert index.lookup("молоко") == {"name": "Молоко", "calories": 60.0}
+
+
+def test_multi_word_lookup_matches_words_in_any_order(index):
+    assert index.lookup("natural greek yogurt") == {"name": "Greek yogurt natural", "calories": 97.0}
+    assert index.lookup("chips banana") == {"name": "Banana chips", "calories": 519.0}
+
+
+def test_partial_query_prefers_the_shortest_name(index):
+    assert index.lookup("yogurt") == {"name": "Greek yogurt natural", "calories": 97.0}
+    assert index.lookup("шоколадное") == {"name": "Молоко шоколадное", "calories": 80.0}
+
+
+def test_typo_lookup_in_latin_and_cyrillic(index):
+    assert index.lookup("bananna") == {"name": "Banana", "calories": 89.0}
+    assert index.lookup("молако") == {"name": "Молоко", "calories": 60.0}
+    assert index.lookup("greek yougurt") == {"name": "Greek yogurt natural", "calories": 97.0}
+
+
+def test_unknown_food_is_not_found(index):
+    assert index.lookup("pizza") is None
+
+
+def test_long_word_is_corrected_without_edit_generation(index):
+    long_name = "superfood" * 5
+    assert len(long_name) > MAX_EDIT_LENGTH
+    index.add_many([(long_name, 400)])
+    index.rebuild()
+    typo = long_name[:20] + "x" + long_name[21:]
+    assert index.lookup(typo) == {"name": long_name, "calories": 400.0}
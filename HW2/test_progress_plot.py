@@ -0,0 +1,46 @@
+import asyncio
+import io
+import os
+from aiogram.types import BufferedInputFile
+from matplotlib.image import imread
+
+### config требует токены при импорте; настоящие запросы тесты не делают
+for name in ("WEATHER_API_KEY", "BOT_TOKEN", "API_NINJAS_KEY"):
+    os.environ.setdefault(name, "test")
+
+import utils
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+### разные пропорции воды и калорий, в том числе перевыполнение цели
+PROGRESS = [(water, 2000, calories, 2500) for water in (0, 500, 2600) for calories in (0, 800, 2500)]
+
+
+def test_concurrent_renders_match_sequential_ones():
+    ### эталон рисуем по одному, прямо в этом потоке
+    expected = [utils.generate_progress_plot(*progress) for progress in PROGRESS]
+
+    async def scenario():
+        ### запросов больше, чем потоков пула: заготовки графиков переиспользуются между рендерами
+        return await asyncio.gather(*(utils.render_progress_plot(*progress) for progress in PROGRESS * 2))
+
+    rendered = asyncio.run(scenario())
+
+    assert rendered == expected * 2
+    ### разный прогресс - разные картинки, то есть высоты столбиков не "залипают" между рендерами
+    assert len(set(expected)) == len(PROGRESS)
+    ### при нулевой цели столбик пустой, а не деление на ноль
+    assert utils.generate_progress_plot(300, 0, 100, 0) == expected[0]
+
+
+def test_render_gives_valid_png_input_file():
+    async def scenario():
+        return await utils.render_progress_plot(1200, 2000, 1800, 2500)
+
+    plot = asyncio.run(scenario())
+    photo = BufferedInputFile(plot, filename="progress.png")
+
+    assert photo.filename == "progress.png"
+    assert photo.data.startswith(PNG_SIGNATURE)
+    image = imread(io.BytesIO(photo.data), format="png")
+    assert image.ndim == 3 and image.shape[0] > 100 and image.shape[1] > 100
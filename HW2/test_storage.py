@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+from states import ProfileSetup
+from storage import SQLiteBackend, UserStore, create_storages
+
+KEY = StorageKey(bot_id=1, chat_id=42, user_id=42)
+
+
+class FlakyBackend(SQLiteBackend):
+    """
+    SQLite backend whose first save fails, like a locked database
+    """
+
+    failures = 1
+
+    def save_many(self,
+                  records: dict):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        super().save_many(records)
+
+
+def test_batched_updates_survive_reopen_with_fsm_state(tmp_path):
+    path = str(tmp_path / "bot.sqlite")
+
+    async def write():
+        users, fsm_storage = create_storages(path, flush_interval=3600)
+        await users.start()
+        users[1] = {"logged_water": 0, "logged_calories": 0}
+        users[2] = {"logged_water": 0}
+        for _ in range(10):
+            users[1]["logged_water"] += 250  ### счетчики меняются только в памяти
+        users[1]["logged_calories"] += 300
+        assert await users.flush() == 2  ### одна пачка на двух пользователей, а не запись на каждое изменение
+        assert await users.flush() == 0
+        users[2]["logged_water"] += 500
+        await fsm_storage.set_state(KEY, ProfileSetup.current_weight)
+        await fsm_storage.set_data(KEY, {"weight": 70})
+        await users.close()  ### последние изменения сбрасываются при закрытии
+        await fsm_storage.close()
+
+    async def read():
+        users, fsm_storage = create_storages(path)
+        await users.start()
+        result = dict(users), await fsm_storage.get_state(KEY), await fsm_storage.get_data(KEY)
+        await users.close()
+        await fsm_storage.close()
+        return result
+
+    asyncio.run(write())
+    users, state, data = asyncio.run(read())
+    assert users == {1: {"logged_water": 2500, "logged_calories": 300}, 2: {"logged_water": 500}}
+    assert state == ProfileSetup.current_weight.state
+    assert data == {"weight": 70}
+
+
+def test_deleted_then_re_added_user_is_kept(tmp_path):
+    path = str(tmp_path / "bot.sqlite")
+
+    async def scenario():
+        users = UserStore(SQLiteBackend(path))
+        await users.start()
+        users[1] = {"logged_water": 100}
+        users[2] = {"logged_water": 200}
+        await users.flush()
+        del users[1]
+        del users[2]
+        users[2] = {"logged_water": 0}
+        await users.close()
+
+        reopened = UserStore(SQLiteBackend(path))
+        await reopened.start()
+        result = dict(reopened)
+        await reopened.close()
+        return result
+
+    assert asyncio.run(scenario()) == {2: {"logged_water": 0}}
+
+
+def test_failed_flush_is_retried(tmp_path):
+    path = str(tmp_path / "bot.sqlite")
+
+    async def scenario():
+        users = UserStore(FlakyBackend(path))
+        await users.start()
+        users[1] = {"logged_water": 100}
+        with pytest.raises(RuntimeError):
+            await users.flush()
+        users[1]["logged_water"] += 100
+        assert await users.flush() == 1
+        await users.close()
+
+    asyncio.run(scenario())
+    backend = SQLiteBackend(path)
+    assert backend.load_all() == {1: {"logged_water": 200}}
+    backend.close()
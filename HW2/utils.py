@@ -1,42 +1,51 @@
-import requests
-import matplotlib.pyplot as plt
-from config import WEATHER_API_KEY, API_NINJAS_KEY
+import asyncio
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from matplotlib.figure import Figure
+from config import WEATHER_API_KEY, API_NINJAS_KEY, NUTRITION_INDEX_PATH
 import emoji
+from http_client import client
+from nutrition_index import NutritionIndex
 
 LAT_LON_URL = 'http://api.openweathermap.org/geo/1.0/direct'
 WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
 FOOD_API_URL = "https://world.openfoodfacts.org/cgi/search.pl?action=process&search_terms={}&json=true"
 WORKOUT_API_URL = "https://api.api-ninjas.com/v1/caloriesburned?activity={}"
 
+logger = logging.getLogger(__name__)
 
-def get_city_lat_lon(city: str):
+PLOT_WORKERS = 2  ### одновременно рисуемых графиков
+_plot_executor = ThreadPoolExecutor(max_workers=PLOT_WORKERS, thread_name_prefix="progress-plot")
+_plot_templates = threading.local()  ### у каждого потока пула своя заготовка графика
+
+### локальный индекс продуктов, если его импортировали; без него все запросы идут в OpenFoodFacts
+nutrition_index = NutritionIndex(NUTRITION_INDEX_PATH) if os.path.exists(NUTRITION_INDEX_PATH) else None
+
+
+async def async_get_city_lat_lon(city: str):
     """
-    Fetch latitude and longitude of the given city using OpenWeatherMap API
+    Fetch latitude and longitude of the given city using OpenWeatherMap API (shared pooled client, does not block the event loop)
     """
-    try:
-
-        params = {
-            "q": city,
-            "appid": WEATHER_API_KEY,
-        }
-        response = requests.get(LAT_LON_URL, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            if data:
-                return data[0]['lat'], data[0]['lon']
-            else:
-                raise Exception(f"City not found: {city}")
-        else:
-            raise Exception(f"Error fetching latitude/longitude: {response.status_code}, {response.text}")
-    except:
-        raise Exception(f"Error fetching latitude/longitude: {response.status_code}, {response.text}")
+    params = {
+        "q": city,
+        "appid": WEATHER_API_KEY,
+    }
+    status, data = await client.get_json("openweathermap", LAT_LON_URL, params=params)
+    if status != 200:
+        raise Exception(f"Error fetching latitude/longitude: {status}, {data}")
+    if not data:
+        raise Exception(f"City not found: {city}")
+    return data[0]['lat'], data[0]['lon']
 
 
-def get_weather(city: str):
+async def async_get_weather(city: str):
     """
     Fetch current temperature in the given city by its latitude and longitude
     """
-    lat, lon = get_city_lat_lon(city)
+    lat, lon = await async_get_city_lat_lon(city)
 
     weather_params = {
         "lat": lat,
@@ -44,51 +53,84 @@ def get_weather(city: str):
         "appid": WEATHER_API_KEY,
         "units": "metric"  # Convert temperature to Celsius
     }
-    response = requests.get(WEATHER_URL, params=weather_params)
-    if response.status_code == 200:
-        data = response.json()
-        return data["main"]["temp"]
-    else:
-        raise Exception(f"Error fetching current temperature: {response.status_code}, {response.text}")
+    status, data = await client.get_json("openweathermap", WEATHER_URL, params=weather_params)
+    if status != 200:
+        raise Exception(f"Error fetching current temperature: {status}, {data}")
+    return data["main"]["temp"]
 
-def get_food_calories(food_name: str):
+async def async_get_food_calories(food_name: str):
     """
-    Fetch calorie content of a given food item using OpenFoodFacts API
+    Fetch calorie content of a given food item from the local index or, if it is not there, using OpenFoodFacts API
     """
+    if nutrition_index is not None:
+        try:
+            food = await asyncio.to_thread(nutrition_index.lookup, food_name)
+        except Exception as e:
+            ### поврежденный или заблокированный индекс не должен ломать /log_food - идем в OpenFoodFacts
+            logger.warning("Nutrition index lookup failed for %r: %s", food_name, e)
+            food = None
+        if food is not None:
+            return food
+
     url = FOOD_API_URL.format(food_name.replace(" ", "-"))
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
-        products = data.get('products', [])
-        if products:  ### проверяем, есть ли найденные продукты
-            first_product = products[0] ### для простоты берем первый продукт
-            return {
-                'name': first_product.get('product_name', 'unknown'),
-                'calories': first_product.get('nutriments', {}).get('energy-kcal_100g', 0)
-            }
-        else:
-            return None
-    else:
-        raise Exception(f"Error fetching food calorie content: {response.status_code}, {response.text}")
+    status, data = await client.get_json("openfoodfacts", url)
+    if status != 200:
+        raise Exception(f"Error fetching food calorie content: {status}, {data}")
+    products = data.get('products', [])
+    if not products:
+        return None
+    first_product = products[0]  ### для простоты берем первый продукт
+    return {
+        'name': first_product.get('product_name', 'unknown'),
+        'calories': first_product.get('nutriments', {}).get('energy-kcal_100g', 0)
+    }
+
+def _progress_template():
+    """
+    Figure with axes, labels and bars created once per worker thread; only bar heights change between renders
+    """
+    template = getattr(_plot_templates, "progress", None)
+    if template is None:
+        ### Figure без pyplot: нет глобального состояния, поэтому можно рисовать из нескольких потоков
+        fig = Figure(figsize=(5, 3))
+        ax = fig.subplots()
+        bars = ax.bar(['Water (ml)', 'Calories (kcal)'], [0, 0], color=['blue', 'red'])
+        ax.set_ylim(0, 1)
+        ax.set_ylabel("Progress (%)")
+        ax.set_title("Your progress")
+        template = _plot_templates.progress = (fig, bars)
+    return template
+
 
 def generate_progress_plot(water_logged, water_goal, calories_consumed, calories_goal):
     """
-    Generate a progress bar chart for water intake and calorie consumption
+    Generate a progress bar chart for water intake and calorie consumption, returns PNG bytes
     """
-    labels = ['Water (ml)', 'Calories (kcal)']
     values = [
         water_logged / water_goal if water_goal > 0 else 0,
         calories_consumed / calories_goal if calories_goal > 0 else 0
     ]
 
-    fig, ax = plt.subplots(figsize=(5, 3))
-    ax.bar(labels, values, color=['blue', 'red'])
-    ax.set_ylim(0, 1)
-    ax.set_ylabel("Progress (%)")
-    ax.set_title("Your progress")
+    fig, bars = _progress_template()
+    for bar, value in zip(bars, values):
+        bar.set_height(value)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    return buffer.getvalue()
+
+
+async def render_progress_plot(water_logged, water_goal, calories_consumed, calories_goal):
+    """
+    Render the progress chart in the plot worker pool, so the event loop keeps serving other users
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_plot_executor, generate_progress_plot,
+                                      water_logged, water_goal, calories_consumed, calories_goal)
+
 
-    plt.savefig("progress.png", bbox_inches="tight")
-    plt.close()
+def close_plot_pool():
+    _plot_executor.shutdown(wait=False)
 
 def text_to_emoji(word):
     """
@@ -149,18 +191,16 @@ def calculate_water_intake(current_weight: float,
 
     return round(total_water)
 
-def get_calories_burned(activity: str,
-                        duration: int):
+async def async_get_calories_burned(activity: str,
+                                    duration: int):
     """
     Fetch calories burned for a given activity and duration using the API Ninjas
     """
     url = WORKOUT_API_URL.format(activity)
     headers = {"X-Api-Key": API_NINJAS_KEY}
 
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        data = response.json()
-        if data:
-            calories_per_min = data[0].get("calories_per_hour", 0)/60.0
-            return round(calories_per_min * duration)
+    status, data = await client.get_json("api_ninjas", url, headers=headers)
+    if status == 200 and data:
+        calories_per_min = data[0].get("calories_per_hour", 0)/60.0
+        return round(calories_per_min * duration)
     return None
\ No newline at end of file